@@ -0,0 +1,102 @@
+import glob, json, math, os, statistics
+import config as conf
+from utils import revision_matches
+
+METRICS = ["wall", "user", "sys", "maxrss_kb"]
+LABELS = {"wall": "wall (s)", "user": "user (s)", "sys": "sys (s)", "maxrss_kb": "peak RSS (KiB)"}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+def summarize(values):
+    q1, q3 = percentile(values, 25), percentile(values, 75)
+    iqr = q3 - q1
+    # Tukey's fences: samples beyond 1.5 IQR from the quartiles
+    outliers = [v for v in values if v < q1 - 1.5 * iqr or v > q3 + 1.5 * iqr]
+    return {
+        "mean": statistics.fmean(values),
+        "median": statistics.median(values),
+        "p95": percentile(values, 95),
+        "stddev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "min": min(values),
+        "max": max(values),
+        "outliers": len(outliers),
+    }
+
+def mann_whitney(a, b):
+    # Two-sided Mann-Whitney U test (normal approximation with tie correction), returns the p-value
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return None
+    ranked = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    r1 = sum(r for r, (_, group) in zip(ranks, ranked) if group == 0)
+    u = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / sigma
+    return math.erfc(max(z, 0) / math.sqrt(2))
+
+def results_dir(app):
+    return f"{conf.BUILD_DIR}/bench/{app}"
+
+def save_results(app, data):
+    os.makedirs(results_dir(app), exist_ok=True)
+    path = f"{results_dir(app)}/{data['timestamp'].replace(':', '')}-{data.get('revision') or 'norev'}.json"
+    with open(path, "w") as f:
+        f.write(json.dumps(data, indent=2))
+    return path
+
+def load_results(app, ref):
+    # ref is a results file, or a git revision whose latest saved results are used
+    if os.path.isfile(ref):
+        path = ref
+    else:
+        candidates = sorted(p for p in glob.glob(f"{results_dir(app)}/*.json") if revision_matches(p, ref))
+        if not candidates:
+            return None, None
+        path = candidates[-1]
+    with open(path, "r") as f:
+        return path, json.load(f)
+
+def print_summary(samples):
+    print(f"    {'metric':<15} {'mean':>10} {'median':>10} {'p95':>10} {'stddev':>10} {'outliers':>9}")
+    for metric in METRICS:
+        values = [s[metric] for s in samples if metric in s]
+        if not values:
+            continue
+        st = summarize(values)
+        fmt = (lambda v: f"{v:10.0f}") if metric == "maxrss_kb" else (lambda v: f"{v:10.4f}")
+        print(f"    {LABELS[metric]:<15} {fmt(st['mean'])} {fmt(st['median'])} {fmt(st['p95'])} "
+              f"{fmt(st['stddev'])} {st['outliers']:>9}")
+
+def print_comparison(base, current, alpha=0.05):
+    print(f"    {'metric':<15} {'baseline':>10} {'current':>10} {'change':>8} {'p-value':>8}")
+    for metric in METRICS:
+        a = [s[metric] for s in base["samples"] if metric in s]
+        b = [s[metric] for s in current["samples"] if metric in s]
+        if not a or not b:
+            continue
+        ma, mb = statistics.median(a), statistics.median(b)
+        change = 100.0 * (mb - ma) / ma if ma else 0.0
+        p = mann_whitney(a, b)
+        verdict = "" if p is None else ("  significant" if p < alpha else "  noise")
+        print(f"    {LABELS[metric]:<15} {ma:10.4g} {mb:10.4g} {change:+7.1f}% "
+              f"{'n/a' if p is None else f'{p:.4f}':>8}{verdict}")
@@ -0,0 +1,202 @@
+import glob, json, os, re, subprocess
+import config as conf
+from utils import revision_matches
+
+# nm symbol types that take space in the file (bss only exists at run time)
+FILE_TYPES = set("tTdDrRvVwWuni")
+BSS_TYPES = set("bBcC")
+NM_LINE_RE = re.compile(r"^([0-9a-fA-F]+) ([0-9a-fA-F]+) (\S) (.*?)(?:\t(\S+):(\d+))?$")
+STD_NAMESPACES = {"std", "__gnu_cxx", "__cxxabiv1", "__gnu_debug", "__cxx11"}
+OPERATOR_TOKENS = ("<=>", "<<=", ">>=", "->*", "<<", ">>", "<=", ">=", "->", "()", "<", ">")
+
+
+def section_sizes(path):
+    # {section: bytes} for the sections loaded in memory (ALLOC flag)
+    output = subprocess.run(["readelf", "-S", "-W", path], capture_output=True, text=True, check=True).stdout
+    sections = {}
+    for line in output.splitlines():
+        match = re.match(r"^\s*\[\s*\d+\]\s+(\S+)\s+\S+\s+[0-9a-f]+\s+[0-9a-f]+\s+([0-9a-f]+)\s+[0-9a-f]+\s*(\S*)", line)
+        if match and "A" in match.group(3):
+            sections[match.group(1)] = int(match.group(2), 16)
+    return sections
+
+def read_symbols(path):
+    # [(demangled name, size, nm type, source file or None)]; -l maps symbols to files with debug info
+    output = subprocess.run(["nm", "-C", "-S", "-l", "--size-sort", path],
+                            capture_output=True, text=True, errors="replace", check=True).stdout
+    symbols = []
+    for line in output.splitlines():
+        match = NM_LINE_RE.match(line)
+        if match:
+            symbols.append((match.group(4).strip(), int(match.group(2), 16), match.group(3), match.group(5)))
+    return symbols
+
+def strip_templates(name):
+    # "std::vector<int, std::allocator<int> >::push_back(int const&)" -> "std::vector<>::push_back"
+    name = name.replace("(anonymous namespace)", "{anonymous}")
+    out, depth, i = [], 0, 0
+    while i < len(name):
+        ch = name[i]
+        # The "<", ">" and "()" of operator<<, operator<=>, operator() ... are part of the name
+        if name.startswith("operator", i) and (i == 0 or not (name[i - 1].isalnum() or name[i - 1] == "_")):
+            end = i + len("operator")
+            token = next((t for t in OPERATOR_TOKENS if name.startswith(t, end)), "")
+            if depth == 0:
+                out.append(name[i:end + len(token)])
+            i = end + len(token)
+            continue
+        if ch == "(" and depth == 0:
+            break
+        if ch == "<":
+            if depth == 0:
+                out.append("<>")
+            depth += 1
+        elif ch == ">" and depth > 0:
+            depth -= 1
+        elif depth == 0:
+            out.append(ch)
+        i += 1
+    return "".join(out).strip()
+
+def template_family(name):
+    # Template arguments and, for function templates, the leading return type dropped:
+    # "void std::vector<int>::_M_realloc_insert<int>(...)" -> "std::vector<>::_M_realloc_insert<>"
+    base = strip_templates(name)
+    last = base.rsplit(" ", 1)[-1]
+    return last if " " in base and "::" in last and not base.startswith(("vtable ", "typeinfo ", "VTT ", "guard ")) else base
+
+def top_namespace(name):
+    # Leading namespace of a demangled name, or "(global)"
+    base = template_family(name)
+    if base.startswith(("vtable for ", "typeinfo for ", "typeinfo name for ", "VTT for ", "guard variable for ")):
+        return top_namespace(base.split(" for ", 1)[1])
+    parts = base.split("::")
+    return parts[0] if len(parts) > 1 and parts[0] else "(global)"
+
+def origin(namespace, source, third_party_namespaces):
+    # core, app, std, third-party or unknown; source paths win over namespaces when there is debug info
+    if source:
+        source = source.replace("\\", "/")
+        root = os.path.abspath(".").replace("\\", "/") + "/"
+        if "/_deps/" in source or "/fcpp/deps/" in source:
+            return "third-party"
+        if source.startswith(root + "core/"):
+            return "core"
+        if source.startswith(root + "apps/") or source.startswith(root + "benchmarks/"):
+            return "app"
+        if source.startswith("/usr/"):
+            return "std" if "c++" in source or "bits/" in source else "system"
+    if namespace in STD_NAMESPACES:
+        return "std"
+    if namespace == "core":
+        return "core"
+    if namespace in third_party_namespaces:
+        return "third-party"
+    return "unknown"
+
+def is_elf(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == b"\x7fELF"
+    except OSError:
+        return False
+
+def display_source(source):
+    if not source:
+        return "(no debug info)"
+    rel = os.path.relpath(source)
+    return source if rel.startswith("..") else rel.replace("\\", "/")
+
+def analyze(path, third_party_namespaces=()):
+    # Size report of an ELF file: sections, and symbol bytes per namespace, template, file and origin
+    report = {"file": path, "file_size": os.path.getsize(path), "sections": section_sizes(path),
+              "symbols": {}, "namespaces": {}, "templates": {}, "files": {}, "origins": {}, "bss": 0}
+    for name, size, kind, source in read_symbols(path):
+        if kind in BSS_TYPES:
+            report["bss"] += size
+            continue
+        if kind not in FILE_TYPES:
+            continue
+        namespace = top_namespace(name)
+        report["symbols"][name] = report["symbols"].get(name, 0) + size
+        report["namespaces"][namespace] = report["namespaces"].get(namespace, 0) + size
+        if "<" in name:
+            family = template_family(name)
+            count, total = report["templates"].get(family, (0, 0))
+            report["templates"][family] = (count + 1, total + size)
+        report["files"][display_source(source)] = report["files"].get(display_source(source), 0) + size
+        where = origin(namespace, source, third_party_namespaces)
+        report["origins"][where] = report["origins"].get(where, 0) + size
+    return report
+
+def results_dir(app):
+    return f"{conf.BUILD_DIR}/size/{app}"
+
+def save_report(app, report):
+    os.makedirs(results_dir(app), exist_ok=True)
+    path = f"{results_dir(app)}/{report['timestamp']}-{report.get('revision') or 'norev'}.json"
+    with open(path, "w") as f:
+        f.write(json.dumps(report))
+    return path
+
+def load_report(app, ref):
+    # ref is a saved report, or a git revision whose latest saved report is used
+    if os.path.isfile(ref):
+        path = ref
+    else:
+        candidates = sorted(p for p in glob.glob(f"{results_dir(app)}/*.json") if revision_matches(p, ref))
+        if not candidates:
+            return None, None
+        path = candidates[-1]
+    with open(path, "r") as f:
+        return path, json.load(f)
+
+def human(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024 or unit == "MiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def symbol_total(report):
+    return sum(report["symbols"].values())
+
+def loaded_size(report):
+    # What a stripped binary ships: the sections mapped at run time (no debug info, no symbol table)
+    return sum(size for name, size in report["sections"].items() if name != ".bss" and name != ".tbss")
+
+def print_table(title, rows, total, top):
+    print(f"\n{title}:")
+    for name, size in sorted(rows.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {human(size):>10} {100.0 * size / total if total else 0:5.1f}%  {name[:110]}")
+
+def print_report(report, top):
+    print(f"{report['file']}: {human(report['file_size'])} on disk, {human(loaded_size(report))} loaded")
+    total = symbol_total(report)
+    print_table("Sections", report["sections"], sum(report["sections"].values()), top)
+    print_table("Origin (core vs third-party)", report["origins"], total, top)
+    print_table("Namespaces", report["namespaces"], total, top)
+    print_table("Source files", report["files"], total, top)
+    templates = {f"{family} ({count} instantiations)": size for family, (count, size) in report["templates"].items()}
+    print_table("Templates", templates, total, top)
+    print_table("Symbols", report["symbols"], total, top)
+
+def print_diff(base, current, top):
+    # Growth per section, origin, namespace and symbol; returns the loaded size change in percent
+    percent = 0.0
+    for label, before, after in (("file size", base["file_size"], current["file_size"]),
+                                 ("loaded size", loaded_size(base), loaded_size(current))):
+        change = after - before
+        percent = 100.0 * change / before if before else 0.0
+        print(f"    {label:<12} {human(before):>10} -> {human(after):>10}  "
+              f"{'+' if change >= 0 else '-'}{human(abs(change))} ({percent:+.1f}%)")
+    for key, title in (("sections", "Sections"), ("origins", "Origin"), ("namespaces", "Namespaces"), ("symbols", "Symbols")):
+        deltas = {name: current[key].get(name, 0) - base[key].get(name, 0)
+                  for name in set(base[key]) | set(current[key])}
+        deltas = {name: d for name, d in deltas.items() if d}
+        if not deltas:
+            continue
+        print(f"\n  {title} (largest changes):")
+        for name, delta in sorted(deltas.items(), key=lambda item: -abs(item[1]))[:top]:
+            state = " (new)" if name not in base[key] else " (removed)" if name not in current[key] else ""
+            print(f"    {'+' if delta > 0 else '-'}{human(abs(delta)):>10}  {name[:110]}{state}")
+    return percent
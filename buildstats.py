@@ -0,0 +1,136 @@
+import json, os
+
+COMPILE_SUFFIXES = (".o", ".obj", ".pch", ".gch")
+SKIPPED_OUTPUTS = ("build.ninja",)
+
+
+def parse_ninja_log(build_dir):
+    # {output: (start_ms, end_ms)} keeping the latest entry of each output
+    entries = {}
+    try:
+        with open(f"{build_dir}/.ninja_log", "r") as log:
+            for line in log:
+                if line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 4:
+                    continue
+                entries[fields[3]] = (int(fields[0]), int(fields[1]))
+    except FileNotFoundError:
+        return {}
+    return entries
+
+def ninja_log_size(build_dir):
+    try:
+        return os.path.getsize(f"{build_dir}/.ninja_log")
+    except OSError:
+        return 0
+
+def read_steps_since(build_dir, offset):
+    # [(output, start_ms, duration_ms)] appended to .ninja_log after offset
+    try:
+        with open(f"{build_dir}/.ninja_log", "r") as log:
+            if os.path.getsize(log.name) < offset:
+                offset = 0  # the log was recompacted by ninja
+            log.seek(offset)
+            lines = log.read().splitlines()
+    except OSError:
+        return []
+    steps = []
+    for line in lines:
+        fields = line.split("\t")
+        if line.startswith("#") or len(fields) < 4:
+            continue
+        steps.append((fields[3], int(fields[0]), int(fields[1]) - int(fields[0])))
+    return steps
+
+def step_target(output):
+    # CMake target that produced a .ninja_log output: objects live in CMakeFiles/<target>.dir/,
+    # executables and libraries are named after their target (lib<target>.a, <target>.exe, ...)
+    parts = output.replace("\\", "/").split("/")
+    for part in parts:
+        if part.endswith(".dir") and "CMakeFiles" in parts:
+            return part[:-len(".dir")]
+    name = parts[-1]
+    for suffix in (".exe", ".a", ".lib", ".dll", ".dylib"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if ".so" in name:
+        name = name[:name.index(".so")]
+    if name.startswith("lib") and name != parts[-1]:
+        name = name[len("lib"):]
+    return name
+
+def per_target(steps):
+    # {target: (first start_ms, last end_ms, link/archive ms)} from read_steps_since() steps
+    targets = {}
+    for output, start, duration in steps:
+        if os.path.basename(output) in SKIPPED_OUTPUTS:
+            continue
+        first, last, link = targets.get(step_target(output), (start, start + duration, 0))
+        if not output.endswith(COMPILE_SUFFIXES):
+            link += duration
+        targets[step_target(output)] = (min(first, start), max(last, start + duration), link)
+    return targets
+
+def split_steps(entries):
+    # (compile steps, link/archive steps) as lists of (output, start_ms, duration_ms)
+    compiles, links = [], []
+    for output, (start, end) in entries.items():
+        if os.path.basename(output) in SKIPPED_OUTPUTS:
+            continue
+        step = (output, start, end - start)
+        (compiles if output.endswith(COMPILE_SUFFIXES) else links).append(step)
+    return compiles, links
+
+def time_trace_path(build_dir, output):
+    # clang writes foo.cpp.o's -ftime-trace next to it as foo.cpp.json
+    return f"{build_dir}/{os.path.splitext(output)[0]}.json"
+
+def load_time_trace(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("traceEvents", [])
+    except (OSError, ValueError):
+        return []
+
+def display_path(path):
+    rel = os.path.relpath(path)
+    return path if rel.startswith("..") else rel.replace("\\", "/")
+
+def aggregate(build_dir, compiles):
+    # Sums -ftime-trace events across TUs: {"headers": {path: (us, tus)}, "templates": {name: (us, count)}}
+    headers, templates = {}, {}
+    traced = 0
+    for output, _, _ in compiles:
+        events = load_time_trace(time_trace_path(build_dir, output))
+        if events:
+            traced += 1
+        for event in events:
+            if event.get("ph") != "X":
+                continue
+            name, dur = event.get("name"), event.get("dur", 0)
+            detail = (event.get("args") or {}).get("detail", "")
+            if name == "Source":
+                total, count = headers.get(detail, (0, 0))
+                headers[detail] = (total + dur, count + 1)
+            elif name in ("InstantiateClass", "InstantiateFunction"):
+                total, count = templates.get(detail, (0, 0))
+                templates[detail] = (total + dur, count + 1)
+    return {"traced": traced, "headers": headers, "templates": templates}
+
+def write_chrome_trace(build_dir, compiles, links, path):
+    # One row per build step, placed at its real start time from .ninja_log
+    events = []
+    for tid, (output, start, duration) in enumerate(sorted(compiles + links, key=lambda s: s[1]), 1):
+        events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": output}})
+        events.append({"ph": "X", "name": output, "cat": "ninja", "pid": 1, "tid": tid,
+                       "ts": start * 1000, "dur": duration * 1000})
+        for event in load_time_trace(time_trace_path(build_dir, output)):
+            if event.get("ph") != "X" or event.get("name", "").startswith("Total "):
+                continue
+            event = dict(event, pid=1, tid=tid, ts=start * 1000 + event.get("ts", 0))
+            events.append(event)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
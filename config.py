@@ -1,14 +1,126 @@
-import platform
+import sys
 
 BUILD_DIR = "build"
-IS_WINDOWS = platform.system() == "Windows"
+IS_WINDOWS = sys.platform == "win32"
+
+# Source discovery cache (per-directory mtimes and .cpp listings)
+DISCOVERY_INDEX = f"{BUILD_DIR}/.fcpp_discovery.json"
+DISCOVERY_INDEX_VERSION = 2
+SOURCE_EXTENSIONS = (".cpp", ".cc", ".cxx", ".hpp", ".h", ".hh", ".hxx", ".cppm")
+DISCOVERY_PRUNED_DIRS = {"build", ".git", "_deps", ".vscode", "__pycache__"}
+
+# Memory budget per compile job, used to cap the default -j (override with BUILD_JOB_MEMORY_MB)
+DEFAULT_JOB_MEMORY_MB = 1536
+
+# Compiler launcher: "auto" (ccache, then sccache), "ccache", "sccache" or "none"
+DEFAULT_COMPILER_CACHE = "auto"
+
+# Linker: "auto" (mold, then lld), "mold", "lld" or "default" (the toolchain's own)
+DEFAULT_LINKER = "auto"
+# SPLIT_DWARF: keep debug info in .dwo files (-gsplit-dwarf) for profiles with debug info
+DEFAULT_SPLIT_DWARF = False
+
+# Hash of the cmake command of the last configure, kept in each build/<profile> tree
+CONFIGURE_STAMP = ".fcpp_configure"
+
+# clang-tidy checks (override with CLANG_TIDY_CHECKS), results cached per TU
+DEFAULT_TIDY_CHECKS = "bugprone-*,performance-*,modernize-*"
+TIDY_CACHE = f"{BUILD_DIR}/.fcpp_tidy_cache.json"
+
+# Hashes of files as last formatted by "fcpp format"
+FORMAT_CACHE = f"{BUILD_DIR}/.fcpp_format_cache.json"
+
+# Include graph of "fcpp deps graph", rescanned only for files whose mtime changed
+INCLUDE_GRAPH_CACHE = f"{BUILD_DIR}/.fcpp_include_graph.json"
+INCLUDE_GRAPH_VERSION = 1
+
+# Build profiles, each configured in its own build/<profile> directory.
+# CXX_FLAGS are appended to CLANG_FLAGS (minus its -O/-g flags), CMAKE_ARGS are passed as-is to cmake.
+DEFAULT_PROFILE = "debug"
+DEFAULT_PROFILES = {
+    "debug": {
+        "BUILD_TYPE": "Debug",
+        "CXX_FLAGS": "",
+    },
+    "release": {
+        "BUILD_TYPE": "Release",
+        "CXX_FLAGS": "-O3 -DNDEBUG",
+    },
+    "relwithdebinfo": {
+        "BUILD_TYPE": "RelWithDebInfo",
+        "CXX_FLAGS": "-O2 -g -DNDEBUG",
+    },
+    "lto": {
+        "BUILD_TYPE": "Release",
+        "CXX_FLAGS": "-O3 -DNDEBUG -flto=thin",
+        "LINKER_FLAGS": "-flto=thin",
+        # core is a static library of bitcode objects: archive it with the LLVM tools
+        "CMAKE_ARGS": ["-DCMAKE_AR=llvm-ar", "-DCMAKE_RANLIB=llvm-ranlib"],
+    },
+    "native": {
+        "BUILD_TYPE": "Release",
+        "CXX_FLAGS": "-O3 -DNDEBUG -march=native",
+    },
+}
+
+# Unity (jumbo) builds, set under "UNITY_BUILD" in .project.config.json and
+# overridable per target under "TARGET_SETTINGS": {"<core|app>": {"UNITY_BUILD": {...}}}.
+# EXCLUDE holds fnmatch patterns of source paths (relative to the target) kept out of the batches.
+DEFAULT_UNITY_BUILD = {
+    "ENABLED": False,
+    "BATCH_SIZE": 8,
+    "EXCLUDE": [],
+}
+
+# Precompiled headers, set under "PCH" in .project.config.json (and per target under
+# TARGET_SETTINGS). The first TOP_N of HEADERS are precompiled; "fcpp pch analyze --save"
+# fills HEADERS with the most included external headers. Apps reuse core's PCH when
+# their header list is covered by it.
+DEFAULT_PCH = {
+    "ENABLED": False,
+    "TOP_N": 10,
+    "HEADERS": [],
+    "REUSE_FROM_CORE": True,
+}
+
+# Sanitizers for "--sanitize", each combination built in build/<profile>-<short names>.
+# OPTIONS are the runtime defaults; user-set *_OPTIONS variables take precedence.
+SANITIZERS = {
+    "address": {"SHORT": "asan", "FLAGS": "-fsanitize=address -fno-omit-frame-pointer",
+                "ENV": "ASAN_OPTIONS", "OPTIONS": "detect_leaks=1:detect_stack_use_after_return=1:strict_string_checks=1"},
+    "undefined": {"SHORT": "ubsan", "FLAGS": "-fsanitize=undefined -fno-omit-frame-pointer",
+                  "ENV": "UBSAN_OPTIONS", "OPTIONS": "print_stacktrace=1"},
+    "thread": {"SHORT": "tsan", "FLAGS": "-fsanitize=thread",
+               "ENV": "TSAN_OPTIONS", "OPTIONS": "second_deadlock_stack=1"},
+    "memory": {"SHORT": "msan", "FLAGS": "-fsanitize=memory -fsanitize-memory-track-origins -fno-omit-frame-pointer",
+               "ENV": "MSAN_OPTIONS", "OPTIONS": "poison_in_dtor=1"},
+    "leak": {"SHORT": "lsan", "FLAGS": "-fsanitize=leak",
+             "ENV": "LSAN_OPTIONS", "OPTIONS": ""},
+}
+INCOMPATIBLE_SANITIZERS = [{"address", "thread"}, {"address", "memory"}, {"thread", "memory"},
+                           {"leak", "thread"}, {"leak", "memory"}]
+
+# Machine-wide FetchContent store (see deps.py): the files FetchContent_Declare()s are read from,
+# extra options used when prebuilding a dependency, and "fcpp deps prune" age limit
+FETCHCONTENT_FILES = ["CorePackages.cmake", "CMakeLists.txt"]
+DEFAULT_DEPS_CACHE = True
+DEFAULT_DEPS_PRUNE_DAYS = 30
+DEPS_BUILD_OPTIONS = {
+    "fmt": ["-DFMT_TEST=OFF", "-DFMT_DOC=OFF"],
+    "nlohmann_json": ["-DJSON_BuildTests=OFF"],
+    "benchmark": ["-DBENCHMARK_ENABLE_TESTING=OFF", "-DBENCHMARK_ENABLE_GTEST_TESTS=OFF"],
+}
+
+# "fcpp bench-micro": baseline results (commit it) and allowed regression in percent
+MICRO_BENCH_BASELINE = "benchmarks/baseline.json"
+DEFAULT_BENCH_THRESHOLD_PCT = 10
 
 
 CMAKELISTS_ROOT = """
 # CMakeList.txt : Top-level CMake project file, do global configuration
 # and include sub-projects here.
 #
-cmake_minimum_required (VERSION 3.12)
+cmake_minimum_required (VERSION {{CMAKE_MINIMUM_VERSION}})
 
 set(CMAKE_CXX_STANDARD 20)
 set(CMAKE_CXX_STANDARD_REQUIRED YES)
@@ -16,18 +128,29 @@ set(CMAKE_CXX_STANDARD_REQUIRED YES)
 # Create project
 project({{PROJ_NAME}} VERSION 0.1.0 LANGUAGES C CXX)
 
+option(FCPP_UNITY_BUILD "Use unity builds for the targets that enable UNITY_BUILD" ON)
+option(FCPP_PCH "Use precompiled headers for the targets that enable PCH" ON)
+{{CXX_MODULES}}
+# Library type of core (and its components), set per profile with "CORE_LIBRARY_TYPE"
+set(FCPP_CORE_LIBRARY_TYPE STATIC CACHE STRING "STATIC, SHARED (fast relinks) or OBJECT")
+set_property(CACHE FCPP_CORE_LIBRARY_TYPE PROPERTY STRINGS STATIC SHARED OBJECT)
+set(CMAKE_WINDOWS_EXPORT_ALL_SYMBOLS ON)
+
 include(FetchContent)
 
+# Tests of every app are registered here, so ctest can run them from the build root
+enable_testing()
+
 {{EXTERNAL_DEPENDENCIES}}
 
 # Add subdirectories
 add_subdirectory(core)
 {{APP_INCLUSIONS}}
-"""
+{{BENCH_INCLUSIONS}}"""
 
 CMAKELISTS_CORE = """
 # core/CMakeLists.txt
-add_library(core
+add_library(core ${FCPP_CORE_LIBRARY_TYPE}
 {{SRC_FILES}}
 )
 
@@ -39,8 +162,43 @@ target_include_directories(core
 {{LIBRARIES}}
 
 set_property(TARGET core PROPERTY CXX_STANDARD 20)
+{{TARGET_PROPERTIES}}"""
+
+# core split into one library per core/src/<component> ("CORE_COMPONENTS" in .project.config.json).
+# core stays as an interface target linking every component; CorePackages.cmake is applied
+# to core_external, which every component links.
+CMAKELISTS_CORE_COMPONENTS = """
+# core/CMakeLists.txt
+add_library(core_external INTERFACE)
+target_include_directories(core_external
+    INTERFACE
+        ${CMAKE_CURRENT_SOURCE_DIR}/include
+)
+
+{{LIBRARIES}}
+{{COMPONENTS}}
+add_library(core INTERFACE)
+target_link_libraries(core INTERFACE{{ALL_COMPONENTS}})
+if(FCPP_CORE_LIBRARY_TYPE STREQUAL "OBJECT")
+    # Object libraries don't pass their objects on, so targets linking core get them here
+    target_sources(core INTERFACE{{ALL_OBJECTS}})
+endif()
 """
 
+CMAKELISTS_CORE_COMPONENT = """
+# core/src/{{COMPONENT}}
+add_library(core_{{COMPONENT}} ${FCPP_CORE_LIBRARY_TYPE}
+{{SRC_FILES}}
+)
+target_link_libraries(core_{{COMPONENT}} PUBLIC core_external{{DEPENDENCIES}})
+set_property(TARGET core_{{COMPONENT}} PROPERTY CXX_STANDARD 20)
+{{TARGET_PROPERTIES}}"""
+
+# Files directly under core/src (not in a component directory) form this component
+CORE_COMMON_COMPONENT = "common"
+CORE_LIBRARY_TYPES = ("STATIC", "SHARED", "OBJECT")
+DEFAULT_CORE_LIBRARY_TYPE = "STATIC"
+
 CMAKELISTS_APP = """
 # CMakeList.txt : CMake project for cmake_app, include source and define
 # project specific logic here.
@@ -55,15 +213,63 @@ set(SRC_FILES_APP
 
 add_executable ({{APP_NAME}} ${SRC_FILES_APP})
 target_include_directories({{APP_NAME}} PRIVATE ${CMAKE_CURRENT_SOURCE_DIR}/include)
-target_link_libraries({{APP_NAME}} PRIVATE core)
-
-# TODO: Add tests and install targets if needed.
-
+target_link_libraries({{APP_NAME}} PRIVATE {{CORE_LINK}})
+{{TARGET_PROPERTIES}}
+{{TESTS}}
 set(CPACK_PROJECT_NAME ${PROJECT_NAME})
 set(CPACK_PROJECT_VERSION ${PROJECT_VERSION})
 include(CPack)
 """
 
+# One executable per apps/<app>/tests/*.cpp, built with the app's sources except main.cpp
+CMAKELISTS_APP_TEST = """
+add_executable({{TEST_TARGET}} "{{TEST_FILE}}" ${SRC_FILES_APP_TESTED})
+target_include_directories({{TEST_TARGET}} PRIVATE ${CMAKE_CURRENT_SOURCE_DIR}/include)
+target_link_libraries({{TEST_TARGET}} PRIVATE {{CORE_LINK}})
+add_test(NAME {{TEST_NAME}} COMMAND {{TEST_TARGET}} WORKING_DIRECTORY ${CMAKE_CURRENT_SOURCE_DIR})
+"""
+
+# C++20 modules ("CXX_MODULES": true): the .cppm interface units wrap the headers, so the same
+# sources build either way and FCPP_CXX_MODULES=OFF falls back to the header layout
+CMAKE_MINIMUM_VERSION = "3.12"
+CXX_MODULES_CMAKE_MINIMUM_VERSION = "3.28"
+CXX_MODULES_NINJA_MINIMUM_VERSION = "1.11"
+CXX_MODULES_CLANG_MINIMUM_VERSION = "16"
+
+CMAKELISTS_MODULES_OPTION = """option(FCPP_CXX_MODULES "Consume core through its C++20 module interface units" ON)
+if(FCPP_CXX_MODULES)
+    set(CMAKE_CXX_SCAN_FOR_MODULES ON)
+else()
+    # CMP0155 (NEW with a 3.28 maximum) would scan every C++20 source even without modules
+    set(CMAKE_CXX_SCAN_FOR_MODULES OFF)
+endif()
+"""
+
+# Micro-benchmarks (Google Benchmark), one target per benchmarks/<name>
+CMAKELISTS_BENCH_DEPENDENCY = """
+# Micro-benchmarks: use an installed Google Benchmark, or fetch it
+find_package(benchmark QUIET)
+if(NOT benchmark_FOUND)
+    set(BENCHMARK_ENABLE_TESTING OFF CACHE BOOL "" FORCE)
+    set(BENCHMARK_ENABLE_GTEST_TESTS OFF CACHE BOOL "" FORCE)
+    FetchContent_Declare(
+        benchmark
+        GIT_REPOSITORY https://github.com/google/benchmark.git
+        GIT_TAG        v1.8.3
+    )
+    FetchContent_MakeAvailable(benchmark)
+endif()
+"""
+
+CMAKELISTS_BENCH = """
+# benchmarks/{{BENCH_NAME}}/CMakeLists.txt
+add_executable(bench_{{BENCH_NAME}}
+{{SRC_FILES}}
+)
+target_include_directories(bench_{{BENCH_NAME}} PRIVATE ${CMAKE_CURRENT_SOURCE_DIR}/include)
+target_link_libraries(bench_{{BENCH_NAME}} PRIVATE {{CORE_LINK}} benchmark::benchmark)
+{{TARGET_PROPERTIES}}"""
+
 CMAKE_CORE_EDITABLE = """# Add the needed external dependencies here.
 
 # FetchContent_Declare(
@@ -117,6 +323,24 @@ DEFAULT_CLASSHPP = """
 """
 
 
+DEFAULT_BENCHCPP = """
+#include <benchmark/benchmark.h>
+#include <string>
+
+#include "core/class.hpp"
+
+static void BM_StringCopy(benchmark::State& state) {
+    std::string x = "hello";
+    for (auto _ : state) {
+        std::string copy(x);
+        benchmark::DoNotOptimize(copy);
+    }
+}
+BENCHMARK(BM_StringCopy);
+
+BENCHMARK_MAIN();
+"""
+
 DEFAULT_CORECLASSHPP = """
 #pragma once
 
@@ -130,6 +354,49 @@ namespace core
 }
 """
 
+DEFAULT_COREMODULE = """
+module;
+// Global module fragment: the headers stay the single source of truth, core/src/*.cpp
+// and the header layout keep using them directly.
+#include "core/class.hpp"
+
+export module core;
+
+// Re-export what the apps use (add a using-declaration per public entity)
+export namespace core {
+    using core::MyClass;
+}
+"""
+
+DEFAULT_APPMODULE = """
+module;
+#include "subdir/class.hpp"
+
+export module {{MODULE_NAME}};
+
+// Re-export the entities declared in subdir/class.hpp, e.g.
+// export namespace subdir { using subdir::MyClass; }
+"""
+
+DEFAULT_MAINCPP_MODULES = """
+#include <iostream>
+
+// FCPP_USE_MODULES is set by core when the project builds with FCPP_CXX_MODULES
+#ifdef FCPP_USE_MODULES
+import core;
+import {{MODULE_NAME}};
+#else
+#include "core/class.hpp"
+#include "subdir/class.hpp"
+#endif
+
+int main(){
+    core::MyClass().say_hello();
+    std::cout << "Hello World!\\n";
+    return 0;
+}
+"""
+
 DEFAULT_CORECLASSCPP = """
 #include "core/class.hpp"
 #include <iostream>
@@ -0,0 +1,187 @@
+import functools, hashlib, json, os, re, shutil, subprocess, time
+import config as conf
+
+DECLARE_RE = re.compile(r"FetchContent_Declare\s*\(\s*([A-Za-z0-9_.+-]+)(.*?)\)", re.S)
+COMMENT_RE = re.compile(r"#[^\n]*")
+PREBUILT_DIR = "_prebuilt"
+KEY_FILE = "fcpp-key.json"
+
+
+def store_dir():
+    # Machine-wide, shared by every project: FCPP_DEPS_DIR, else $XDG_CACHE_HOME/fcpp/deps
+    if os.environ.get("FCPP_DEPS_DIR"):
+        return os.environ["FCPP_DEPS_DIR"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "fcpp", "deps")
+
+def declared_dependencies():
+    # [{"name", "repository", "tag"}] for the FetchContent_Declare(... GIT_REPOSITORY ... GIT_TAG ...) of the project
+    found = {}
+    for path in conf.FETCHCONTENT_FILES:
+        try:
+            with open(path, "r") as f:
+                text = COMMENT_RE.sub("", f.read())
+        except OSError:
+            continue
+        for name, body in DECLARE_RE.findall(text):
+            fields = body.split()
+            options = dict(zip(fields[::2], fields[1::2]))
+            if "GIT_REPOSITORY" in options and "GIT_TAG" in options:
+                found[name] = {"name": name, "repository": options["GIT_REPOSITORY"], "tag": options["GIT_TAG"]}
+    return list(found.values())
+
+def source_dir(dep):
+    return os.path.join(store_dir(), f"{dep['name']}@{dep['tag']}")
+
+def touch(path):
+    # The directory mtime records the last use, for "fcpp deps prune"
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def prefetch_source(dep):
+    # Shallow clone of the tag, moved into place only once complete
+    target = source_dir(dep)
+    if os.path.isdir(target):
+        return True
+    staging = f"{target}.tmp{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    result = subprocess.run(["git", "-c", "advice.detachedHead=false", "clone", "--quiet", "--depth", "1", "--branch", dep["tag"],
+                             "--recurse-submodules", "--shallow-submodules", dep["repository"], staging], check=False)
+    if result.returncode != 0:
+        # GIT_TAG may be a commit hash, which --branch can't fetch
+        shutil.rmtree(staging, ignore_errors=True)
+        ok = subprocess.run(["git", "clone", "--quiet", dep["repository"], staging], check=False).returncode == 0 and \
+            subprocess.run(["git", "-c", "advice.detachedHead=false", "-C", staging, "checkout", "--quiet", dep["tag"]], check=False).returncode == 0 and \
+            subprocess.run(["git", "-C", staging, "submodule", "update", "--quiet", "--init", "--recursive"],
+                           check=False).returncode == 0
+        if not ok:
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another fcpp finished the same clone first
+        shutil.rmtree(staging, ignore_errors=True)
+    return True
+
+@functools.lru_cache(maxsize=None)
+def compiler_version(compiler):
+    try:
+        output = subprocess.run([compiler, "--version"], capture_output=True, text=True, check=False).stdout
+    except OSError:
+        return compiler
+    return output.splitlines()[0] if output else compiler
+
+def prebuilt_key(compiler, build_type, cxx_flags):
+    # Installed dependencies are only reused by builds with the same compiler, build type and flags
+    description = {"compiler": compiler_version(compiler), "build_type": build_type, "cxx_flags": cxx_flags}
+    digest = hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16]
+    return digest, description
+
+def prebuilt_dir(key):
+    return os.path.join(store_dir(), PREBUILT_DIR, key)
+
+def build_prebuilt(dep, compiler, build_type, cxx_flags):
+    # Builds and installs a cached source tree into the prefix of (compiler, build type, flags)
+    key, description = prebuilt_key(compiler, build_type, cxx_flags)
+    prefix = prebuilt_dir(key)
+    build_dir = os.path.join(store_dir(), PREBUILT_DIR, f".build-{key}-{dep['name']}@{dep['tag']}")
+    command = ["cmake", "-S", source_dir(dep), "-B", build_dir, "-G", "Ninja",
+               f"-DCMAKE_BUILD_TYPE={build_type}", f"-DCMAKE_CXX_COMPILER={compiler}", f"-DCMAKE_CXX_FLAGS={cxx_flags}",
+               f"-DCMAKE_INSTALL_PREFIX={prefix}", "-DCMAKE_POSITION_INDEPENDENT_CODE=ON", "-DBUILD_TESTING=OFF"]
+    command += conf.DEPS_BUILD_OPTIONS.get(dep["name"], [])
+    steps = [command, ["cmake", "--build", build_dir], ["cmake", "--install", build_dir]]
+    ok = all(subprocess.run(step, stdout=subprocess.DEVNULL, check=False).returncode == 0 for step in steps)
+    shutil.rmtree(build_dir, ignore_errors=True)
+    if ok:
+        os.makedirs(prefix, exist_ok=True)
+        installed = load_key_file(prefix).get("installed", {})
+        installed[dep["name"]] = dep["tag"]
+        with open(os.path.join(prefix, KEY_FILE), "w") as f:
+            f.write(json.dumps(dict(description, installed=installed), indent=2))
+    return ok
+
+def load_key_file(prefix):
+    try:
+        with open(os.path.join(prefix, KEY_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def cmake_args(compiler, build_type, cxx_flags, use_store=True):
+    # -D options pointing FetchContent at the store; (args, names of declared deps missing from it).
+    # Every option gets an explicit value, possibly empty/OFF, since CMakeCache.txt keeps old ones.
+    args, missing = [], []
+    dependencies = declared_dependencies()
+    for dep in dependencies:
+        path = source_dir(dep)
+        if use_store and os.path.isdir(path):
+            args.append(f"-DFETCHCONTENT_SOURCE_DIR_{dep['name'].upper()}={path}")
+            touch(path)
+        else:
+            args.append(f"-DFETCHCONTENT_SOURCE_DIR_{dep['name'].upper()}=")
+            missing.append(dep["name"])
+    # Every source is local: never touch the network, not even to check for updates
+    disconnected = use_store and dependencies and not missing
+    args.append(f"-DFETCHCONTENT_FULLY_DISCONNECTED={'ON' if disconnected else 'OFF'}")
+    # The key runs the compiler for its version, so it is only computed when a prefix could be used
+    prefix, installed = None, {}
+    if use_store and dependencies:
+        prefix = prebuilt_dir(prebuilt_key(compiler, build_type, cxx_flags)[0])
+        installed = load_key_file(prefix).get("installed", {})
+    # ALWAYS would also accept any other installed version of a package, so it is only used
+    # when the prefix has every declared dependency at its declared tag
+    if prefix and all(installed.get(d["name"]) == d["tag"] for d in dependencies):
+        # FetchContent_MakeAvailable tries find_package() first, so prebuilt deps skip their build
+        args += [f"-DCMAKE_PREFIX_PATH={prefix}", "-DFETCHCONTENT_TRY_FIND_PACKAGE_MODE=ALWAYS"]
+        touch(prefix)
+    else:
+        args += ["-DCMAKE_PREFIX_PATH=", "-DFETCHCONTENT_TRY_FIND_PACKAGE_MODE=OPT_IN"]
+    return args, missing
+
+def dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def entries():
+    # [(kind, name, path, last used)] of everything in the store
+    found = []
+    root = store_dir()
+    if not os.path.isdir(root):
+        return found
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if name == PREBUILT_DIR:
+            for key in sorted(os.listdir(path)):
+                if not key.startswith("."):
+                    found.append(("prebuilt", key, os.path.join(path, key), os.path.getmtime(os.path.join(path, key))))
+        elif "@" in name and ".tmp" not in name:
+            found.append(("source", name, path, os.path.getmtime(path)))
+    return found
+
+def referenced(entry_name, kind, keys):
+    # Entries the current project uses are never pruned
+    if kind == "prebuilt":
+        return entry_name in keys
+    return entry_name in {f"{d['name']}@{d['tag']}" for d in declared_dependencies()}
+
+def prune(days, keys):
+    # Removes entries unused for `days` days; returns [(kind, name, bytes freed)]
+    cutoff = time.time() - days * 86400
+    removed = []
+    for kind, name, path, last_used in entries():
+        if last_used >= cutoff or referenced(name, kind, keys):
+            continue
+        size = dir_size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append((kind, name, size))
+    return removed
@@ -1,34 +1,162 @@
+# Feature modules (buildstats, deps, includes, ...) are imported by the
+# commands that use them, to keep "fcpp <command>" startup short.
 import argparse
 import subprocess
 import os
 import sys
 import shutil
 import json
+import time
+import fnmatch
+import signal
 import config as conf
-from utils import get_config, set_config, get_apps, is_valid_folder_name, find_cpp_files
+from utils import get_config, set_config, get_apps, is_valid_folder_name, find_cpp_files, find_source_files, write_if_changed, \
+    load_discovery_index, save_discovery_index, default_job_count, \
+    find_compiler_cache, compiler_cache_stats, build_env, \
+    get_profiles, get_default_profile, resolve_profile, derive_profile, get_build_dir, \
+    get_target_setting, find_linker, get_exe_path, get_core_components, get_app_components, \
+    run_measured, git_revision, tool_version, parse_version
 
 
-def cmake_gen():
+def is_profile_flag(flag):
+    # Optimization and debug-info flags, which belong to the build profile
+    return flag.startswith("-O") or flag in ("-g", "-g0", "-g1", "-g2", "-g3") or flag.startswith("-ggdb")
+
+def profile_cxx_flags(config, settings):
+    # CLANG_FLAGS minus its -O/-g flags (older projects have "-O2 -g" there), then the profile's
+    common = [f for f in (config.get("CLANG_FLAGS") or "").split() if not is_profile_flag(f)]
+    return " ".join(common + settings.get("CXX_FLAGS", "").split())
+
+def find_clang_scan_deps():
+    # Distributions often only ship the versioned name (clang-scan-deps-17)
+    for name in ["clang-scan-deps"] + [f"clang-scan-deps-{v}" for v in range(30, 15, -1)]:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+def modules_toolchain_args():
+    # (CMake options for C++20 modules, None or why the header layout is used instead)
+    problems = []
+    for tool, minimum in (("cmake", conf.CXX_MODULES_CMAKE_MINIMUM_VERSION), ("ninja", conf.CXX_MODULES_NINJA_MINIMUM_VERSION),
+                          ("clang++", conf.CXX_MODULES_CLANG_MINIMUM_VERSION)):
+        version = tool_version(tool)
+        if version is None:
+            problems.append(f"{tool} not found")
+        elif version < parse_version(minimum):
+            problems.append(f"{tool} {'.'.join(map(str, version))} < {minimum}")
+    scan_deps = find_clang_scan_deps()
+    if not scan_deps:
+        problems.append("clang-scan-deps not found (install clang-tools)")
+    if problems:
+        return [], f"C++20 modules need: {', '.join(problems)}."
+    return [f"-DCMAKE_CXX_COMPILER_CLANG_SCAN_DEPS={scan_deps}"], None
+
+def configure_command(profile, settings, compiler_cache=None):
+    # (cmake command configuring the build tree of a profile, notes to print when it runs)
     config = get_config()
-    if not config.get("CLANG_FLAGS"):
-        config["CLANG_FLAGS"] = ""
-        
-    os.makedirs(conf.BUILD_DIR, exist_ok=True)
+    notes = []
+    launcher = find_compiler_cache(compiler_cache or config.get("COMPILER_CACHE", conf.DEFAULT_COMPILER_CACHE))
+    if launcher:
+        notes.append(f"Using compiler cache : {launcher}")
+    dropped = [f for f in (config.get("CLANG_FLAGS") or "").split() if is_profile_flag(f)]
+    if dropped:
+        notes.append(f"Ignoring {' '.join(dropped)} from CLANG_FLAGS: optimization and debug info "
+                     "come from the profile (CXX_FLAGS under PROFILES)")
+    cxx_flags = profile_cxx_flags(config, settings)
+    import deps
+    # Always passed, so disabling the store also clears what a previous configure cached
+    use_store = config.get("DEPS_CACHE", conf.DEFAULT_DEPS_CACHE)
+    deps_args, missing = deps.cmake_args("clang++", settings.get("BUILD_TYPE", "Debug"), cxx_flags, use_store)
+    if use_store and missing:
+        notes.append(f"Not in the dependency store (fcpp deps prefetch): {', '.join(missing)}")
+    library_type = settings.get("CORE_LIBRARY_TYPE", conf.DEFAULT_CORE_LIBRARY_TYPE).upper()
+    if library_type not in conf.CORE_LIBRARY_TYPES:
+        print(f"Unknown CORE_LIBRARY_TYPE {library_type} in profile {profile}, expected one of {', '.join(conf.CORE_LIBRARY_TYPES)}")
+        sys.exit(1)
+    linker_flags = settings.get("LINKER_FLAGS", "")
+    linker = find_linker(config.get("LINKER", conf.DEFAULT_LINKER))
+    if linker:
+        notes.append(f"Using linker : {linker}")
+        linker_flags = f"-fuse-ld={linker} {linker_flags}".strip()
+    has_debug_info = settings.get("BUILD_TYPE") in ("Debug", "RelWithDebInfo") or "-g" in cxx_flags.split()
+    if config.get("SPLIT_DWARF", conf.DEFAULT_SPLIT_DWARF) and has_debug_info:
+        cxx_flags += " -gsplit-dwarf"
+        # GNU ld can't build the index; gdb still finds the .dwo files without it
+        if linker:
+            linker_flags += " -Wl,--gdb-index"
+
+    build_dir = get_build_dir(profile)
     cmake_command = [
         "cmake",
+        "-S", ".",
+        "-B", build_dir,
         "-G", "Ninja",  # Strongly recommended to avoid MSVC detection on Windows
         "-DCMAKE_VERBOSE_MAKEFILE=ON",
-        "-DCMAKE_BUILD_TYPE=Debug",
+        "-DCMAKE_EXPORT_COMPILE_COMMANDS=ON",  # used by fcpp tidy and editors
+        f"-DCMAKE_BUILD_TYPE={settings.get('BUILD_TYPE', 'Debug')}",
         "-DCMAKE_C_COMPILER=clang",          # Recommended: also set C compiler
         "-DCMAKE_CXX_COMPILER=clang++",
-        f"-DCMAKE_CXX_FLAGS={config['CLANG_FLAGS']}",
-        ".."
-    ]
-    print("CMAKE COMMAND : "," ".join(cmake_command))
-    
+        f"-DCMAKE_CXX_FLAGS={cxx_flags}",
+        f"-DCMAKE_EXE_LINKER_FLAGS={linker_flags}",
+        f"-DCMAKE_SHARED_LINKER_FLAGS={linker_flags}",
+        # Always passed (possibly empty) so disabling the cache clears a previous launcher
+        f"-DCMAKE_C_COMPILER_LAUNCHER={launcher or ''}",
+        f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher or ''}",
+        f"-DFCPP_CORE_LIBRARY_TYPE={library_type}",
+    ] + deps_args
+    if config.get("CXX_MODULES"):
+        # Always passed, since CMakeCache.txt would keep an OFF from an earlier fallback.
+        # A working toolchain defaults to ON (the profile's CMAKE_ARGS may turn it off);
+        # a missing one forces OFF, after the profile's CMAKE_ARGS.
+        modules_args, note = modules_toolchain_args()
+        if note:
+            notes.append(f"{note} Configuring with the header layout.")
+            cmake_command += settings.get("CMAKE_ARGS", []) + ["-DFCPP_CXX_MODULES=OFF"]
+        else:
+            cmake_command += ["-DFCPP_CXX_MODULES=ON"] + modules_args + settings.get("CMAKE_ARGS", [])
+    else:
+        cmake_command += settings.get("CMAKE_ARGS", [])
+    return cmake_command, notes
+
+def configure_profile(profile, settings, compiler_cache=None, if_changed=False):
+    # With if_changed, an already configured tree is only reconfigured when the
+    # cmake command differs from the one recorded by its last configure
+    import hashlib
+    cmake_command, notes = configure_command(profile, settings, compiler_cache)
+    build_dir = get_build_dir(profile)
+    stamp = f"{build_dir}/{conf.CONFIGURE_STAMP}"
+    digest = hashlib.sha256(json.dumps(cmake_command).encode()).hexdigest()
+    if if_changed and os.path.exists(f"{build_dir}/build.ninja") and os.path.exists(stamp):
+        with open(stamp, "r") as f:
+            if f.read() == digest:
+                return build_dir
+    os.makedirs(build_dir, exist_ok=True)
+    for note in notes:
+        print(note)
+    print(f"CMAKE COMMAND ({profile}) : "," ".join(cmake_command))
     
-    subprocess.run(cmake_command, cwd=conf.BUILD_DIR, check=True)
-    subprocess.run(["cmake", "--build", "."], cwd=conf.BUILD_DIR, check=True)
+    subprocess.run(cmake_command, check=True)
+    with open(stamp, "w") as f:
+        f.write(digest)
+    return build_dir
+
+def ensure_configured(profile, settings, compiler_cache=None):
+    # Each profile has its own build tree, so switching profiles only costs
+    # a configure the first time the profile is used, or when its settings change.
+    return configure_profile(profile, settings, compiler_cache, if_changed=True)
+
+def cmake_gen(compiler_cache=None, profile=None):
+    profile, settings = resolve_profile(profile)
+    if compiler_cache:
+        # Saved, so the next build (which reconfigures from the project config) keeps it
+        config = get_config()
+        if config.get("COMPILER_CACHE") != compiler_cache:
+            config["COMPILER_CACHE"] = compiler_cache
+            set_config(config)
+            print(f"COMPILER_CACHE set to {compiler_cache} in .project.config.json")
+    build_dir = configure_profile(profile, settings)
+    subprocess.run(["cmake", "--build", "."], cwd=build_dir, env=build_env(), check=True)
     
 def render_debug_config_vscode():
     config = get_config()
@@ -37,13 +165,17 @@ def render_debug_config_vscode():
             "version": "0.2.0",
             "configurations": []
         }
+        # The default profile, plus every other profile that has a configured build tree
+        default_profile = get_default_profile()
+        profiles = [default_profile] + [p for p in get_profiles()
+                                        if p != default_profile and os.path.exists(f"{get_build_dir(p)}/build.ninja")]
 
-        for appname in config["APPS"]:
+        for appname, profile in ((a, p) for a in config["APPS"] for p in profiles):
             launchjson['configurations'].append({
-                    "name": "(gdb) Launch "+ appname,
+                    "name": f"(gdb) Launch {appname}" + ("" if profile == default_profile else f" [{profile}]"),
                     "type": "cppdbg",
                     "request": "launch",
-                    "program": "${workspaceFolder}/build/apps/" + f"{appname}/{appname}",
+                    "program": "${workspaceFolder}/" + f"{get_build_dir(profile)}/apps/{appname}/{appname}",
                     "args": [],
                     "stopAtEntry": False,
                     "cwd": "${workspaceFolder}/apps/" + appname,
@@ -68,16 +200,148 @@ def render_debug_config_vscode():
             lj.write(json.dumps(launchjson, indent=2))
 
 
-def build(target,force):
-    if force:
-        subprocess.run(["ninja", "-t", "clean"], cwd=conf.BUILD_DIR, check=True)
-    command = ["cmake", "--build", "."]
-    if target:
-        if target not in get_apps():
-            print(f"App called {target} doesn't exist.")
-            return
+def build_targets(build_dir, targets, jobs, load_average=None, keep_going=False):
+    # Builds targets in one Ninja run, so they compile in parallel, streaming its output.
+    # Returns (ok, {target: first failure}, {target: (seconds, link seconds)})
+    import buildstats
+    command = ["cmake", "--build", ".", "-j", str(jobs)]
+    for target in targets:
         command.extend(["--target", target])
-    subprocess.run(command, cwd=conf.BUILD_DIR, check=True)
+    ninja_args = []
+    if load_average:
+        ninja_args.extend(["-l", str(load_average)])
+    if keep_going:
+        ninja_args.extend(["-k", "0"])
+    if ninja_args:
+        command.extend(["--"] + ninja_args)
+    failures = {}
+    log_offset = buildstats.ninja_log_size(build_dir)
+    process = subprocess.Popen(command, cwd=build_dir, env=build_env(), stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True, errors="replace")
+    for line in process.stdout:
+        sys.stdout.write(line)
+        if line.startswith("FAILED:") and line.split()[1:]:
+            failures.setdefault(buildstats.step_target(line.split()[1]), line.strip())
+    process.wait()
+    if process.returncode != 0 and not failures:
+        failures[" ".join(targets)] = f"exit code {process.returncode}"
+    timings = {target: ((last - first) / 1000, link / 1000) for target, (first, last, link)
+               in buildstats.per_target(buildstats.read_steps_since(build_dir, log_offset)).items()}
+    return process.returncode == 0, failures, timings
+
+
+def compare_builds(variants, title, jobs=None):
+    # Clean builds of each (label, profile) variant; prints wall time and summed compile time
+    import buildstats
+    timings = []
+    for label, variant in variants:
+        print(f"\n== Clean build {label} [{variant[0]}]")
+        start = time.perf_counter()
+        ok = build([], True, jobs=jobs, profile=variant)
+        compiles, _ = buildstats.split_steps(buildstats.parse_ninja_log(get_build_dir(variant[0])))
+        timings.append((label, ok, time.perf_counter() - start, sum(step[2] for step in compiles) / 1000))
+        if not ok:
+            break
+
+    print(f"\n{title}:")
+    print(f"    {'':<16} {'wall':>9} {'compile':>9}")
+    for label, ok, elapsed, compile_s in timings:
+        print(f"    {label:<16} {elapsed:8.1f}s {compile_s:8.1f}s" + ("" if ok else "  (FAILED)"))
+    if len(timings) == 2 and all(t[1] for t in timings):
+        print(f"    speedup          {timings[0][2] / timings[1][2]:8.2f}x "
+              f"{timings[0][3] / timings[1][3] if timings[1][3] else 0:8.2f}x")
+    return all(t[1] for t in timings)
+
+def compare_modules(profile=None, jobs=None):
+    config = get_config()
+    if not config.get("CXX_MODULES"):
+        print('The project doesn\'t use C++20 modules ("CXX_MODULES": true in .project.config.json), nothing to compare.')
+        return False
+    _, problem = modules_toolchain_args()
+    if problem:
+        # The "modules" build would silently fall back to the header layout
+        print(f"{problem} The modules build would use the header layout, nothing to compare.")
+        return False
+    base = resolve_profile(profile)
+    no_cache = ["-DCMAKE_C_COMPILER_LAUNCHER=", "-DCMAKE_CXX_COMPILER_LAUNCHER="]
+    # The module interface units wrap the headers, so both sides compile the same sources
+    variants = [
+        ("headers", derive_profile(base, "headers", cmake_args=no_cache + ["-DFCPP_CXX_MODULES=OFF"])),
+        ("modules", derive_profile(base, "modules", cmake_args=no_cache + ["-DFCPP_CXX_MODULES=ON"])),
+    ]
+    return compare_builds(variants, f"Header vs module layout [{base[0]}]", jobs)
+
+def compare_unity(profile=None, jobs=None):
+    config = get_config()
+    targets = core_targets(config) + get_apps()
+    unity_targets = [t for t in targets if get_target_setting(config, t, "UNITY_BUILD", conf.DEFAULT_UNITY_BUILD).get("ENABLED")]
+    if not unity_targets:
+        print("No target has UNITY_BUILD enabled in .project.config.json, nothing to compare.")
+        return False
+    base = resolve_profile(profile)
+    # Compiler cache disabled so both sides really compile everything
+    no_cache = ["-DCMAKE_C_COMPILER_LAUNCHER=", "-DCMAKE_CXX_COMPILER_LAUNCHER="]
+    variants = [
+        ("without unity", derive_profile(base, "nounity", cmake_args=no_cache + ["-DFCPP_UNITY_BUILD=OFF"])),
+        ("with unity", derive_profile(base, "unity", cmake_args=no_cache + ["-DFCPP_UNITY_BUILD=ON"])),
+    ]
+    return compare_builds(variants, f"Unity build comparison [{base[0]}] (unity targets: {', '.join(unity_targets)})", jobs)
+
+
+def core_targets(config):
+    # ["core"], or its component libraries when core is split
+    components = get_core_components(config)
+    return ["core"] if components is None else [f"core_{c}" for c in sorted(components)]
+
+def build(targets, force, jobs=None, load_average=None, keep_going=False, profile=None):
+    apps = get_apps()
+    cores = core_targets(get_config())
+    for target in targets:
+        if target != "core" and target not in cores and target not in apps:
+            print(f"App called {target} doesn't exist.")
+            return False
+    profile, settings = resolve_profile(profile)
+    build_dir = ensure_configured(profile, settings)
+    # core is shared by every app: build it first so its cost is not
+    # attributed to whichever app happens to come first.
+    schedule = cores + [t for t in (targets or apps) if t != "core" and t not in cores]
+    schedule = list(dict.fromkeys(schedule))
+    if not jobs:
+        jobs = default_job_count()
+
+    if force:
+        subprocess.run(["ninja", "-t", "clean"], cwd=build_dir, check=True)
+    print(f"Building {', '.join(schedule)} [{profile}] with {jobs} jobs"
+          + (f", load average cap {load_average}" if load_average else ""))
+
+    # core is built on its own first; everything else then goes to a single Ninja
+    # run so independent apps compile and link in parallel.
+    stages = [cores, schedule[len(cores):]]
+    failures, timings, finished = {}, {}, []
+    for stage in [s for s in stages if s]:
+        start = time.perf_counter()
+        ok, stage_failures, stage_timings = build_targets(build_dir, stage, jobs, load_average, keep_going)
+        failures.update(stage_failures)
+        timings.update(stage_timings)
+        finished += stage
+        print(f"{'✅' if ok else '❌'} {', '.join(stage)} ({time.perf_counter() - start:.1f}s)")
+        if not ok and not keep_going:
+            break
+
+    # Per-target times come from .ninja_log: time from the target's first to last step
+    print("\nBuild summary:")
+    for target in schedule:
+        if target not in finished:
+            print(f"    {target:<24} {'skipped':<8}")
+            continue
+        elapsed, link = timings.get(target, (0.0, 0.0))
+        # With failures elsewhere, only a target that linked is known to be complete
+        state = "FAILED" if target in failures else "ok" if not failures or link else "unfinished"
+        print(f"    {target:<24} {state:<8} {elapsed:8.1f}s   link {link:6.2f}s")
+    if failures:
+        target, failure = next(iter(failures.items()))
+        print(f"First failure: {target} -> {failure}")
+    return not failures
 
 exit_code_descriptions = {
         0: "✅ Success - Process completed normally",
@@ -107,41 +371,351 @@ exit_code_descriptions = {
         139: "🧩 Segmentation Fault - Memory access violation",
         255: "⛔ Exit Status Out of Range - Exit code exceeded valid range"
     }
-def run(app):
+def signal_name(number):
+    # Real-time signals (SIGRTMIN+n) are valid but not members of signal.Signals
+    try:
+        return signal.Signals(number).name
+    except ValueError:
+        return f"SIG{number}"
+
+def describe_exit_code(exit_code):
+    # Negative codes mean the process was killed by that signal
+    if exit_code < 0:
+        return f"💥 Killed by signal {signal_name(-exit_code)} ({signal.strsignal(-exit_code) or 'unknown'})"
+    # Get the description for the exit code, or provide a generic one if not found
+    return exit_code_descriptions.get(
+        exit_code,
+        f"🔄 Exit Code {exit_code} - Undocumented status code"
+    )
+
+def run(app, profile=None, args=None, env=None, timeout=None, as_json=None, sanitize=None):
+    # Returns the app's exit code (negative: killed by that signal), 1 if it couldn't be run
     if app == "core":
         print("CORE is not intended to be run individually.")
-        return
+        return 1
     if app not in get_apps():
         print(f"App called {app} doesn't exist.")
-        return
-    exe_path = f"{conf.BUILD_DIR}/apps/{app}/{app}"
-    if conf.IS_WINDOWS:
-        exe_path+=".exe"
+        return 1
+    if sanitize:
+        import sanitizers
+        names = sanitizers.parse_sanitize(sanitize)
+        resolved = sanitizers.sanitizer_profile(profile, names)
+        env = dict(env or {}, **sanitizers.sanitizer_env(names, resolved))
+        exit_code = run(app, resolved, args, env, timeout, as_json)
+        if not as_json:
+            sanitizers.summarize(resolved)
+        return exit_code
+    profile, _ = resolve_profile(profile)
+    exe_path = get_exe_path(app, profile)
     if not os.path.exists(exe_path):
         print(f"Executable not found: {exe_path}")
-        return
+        return 1
     try:
-        # Run the process and capture the exit code
-        completed_process = subprocess.run([exe_path], check=False)
-        exit_code = completed_process.returncode
-        
-        # Get the description for the exit code, or provide a generic one if not found
-        description = exit_code_descriptions.get(
-            exit_code, 
-            f"🔄 Exit Code {exit_code} - Undocumented status code"
-        )
-        print(description)
+        # Run the process and capture the exit code and resource usage
+        run_env = dict(os.environ, **env) if env else None
+        result = run_measured([exe_path] + (args or []), env=run_env, timeout=timeout)
+        exit_code = result["exit_code"]
+        if as_json:
+            # as_json is a file, or "-" for stderr: stdout belongs to the app
+            report = json.dumps(dict(result, app=app, profile=profile,
+                                     signal=signal_name(-exit_code) if exit_code < 0 else None))
+            if as_json == "-":
+                print(report, file=sys.stderr)
+            else:
+                with open(as_json, "w") as f:
+                    f.write(report + "\n")
+            return exit_code
+
+        if result["timed_out"]:
+            print(f"⏱️ Timeout - {app} was killed after {timeout}s")
+        print(describe_exit_code(exit_code))
+        print(f"    wall time        : {result['wall']:.3f}s")
+        if "user" in result:
+            print(f"    cpu time         : {result['user'] + result['sys']:.3f}s "
+                  f"(user {result['user']:.3f}s, sys {result['sys']:.3f}s)")
+            print(f"    peak RSS         : {result['maxrss_kb'] / 1024:.1f} MiB")
+            print(f"    page faults      : {result['majflt']} major, {result['minflt']} minor")
+            print(f"    context switches : {result['nvcsw']} voluntary, {result['nivcsw']} involuntary")
+        return exit_code
     except subprocess.SubprocessError as e:
-        return f"fcpp: Process '{app}' exited {str(e)}"
+        print(f"fcpp: Process '{app}' exited {str(e)}")
+        return 1
     except Exception as e:
-        return f"⚠️ Unexpected Error - Exception occurred: {str(e)}"
+        print(f"⚠️ Unexpected Error - Exception occurred: {str(e)}")
+        return 1
+
+
+def watch(app=None, restart=False, profile=None, debounce=0.2, poll=False):
+    import watch as watcher
+    apps = get_apps()
+    if app and app not in apps:
+        print(f"App called {app} doesn't exist.")
+        return
+    profile = resolve_profile(profile)
+    roots = ["core"] + [f"apps/{a}" for a in ([app] if app else apps)]
+    process = None
+
+    def restart_app():
+        nonlocal process
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        exe_path = get_exe_path(app, profile[0])
+        if os.path.exists(exe_path):
+            print(f"Starting {exe_path}")
+            process = subprocess.Popen([exe_path])
+
+    if not build([app] if app else [], False, profile=profile):
+        print("Initial build failed, watching for changes anyway.")
+    elif restart and app:
+        restart_app()
+    print(f"Watching {', '.join(roots)} (Ctrl+C to stop)")
+    try:
+        for first_event, changes in watcher.watch_changes(roots, debounce, poll):
+            for path, kind in sorted(changes.items()):
+                print(f"  {kind:<8} {path}")
+            # Adding/removing sources changes the CMakeLists; render only rewrites the affected ones
+            if any(kind != "modified" for kind in changes.values()):
+                render_cmake_files()
+            touched = {p.split("/")[1] for p in changes if p.startswith("apps/")}
+            if app:
+                targets = [app]
+            elif any(p.startswith("core/") for p in changes):
+                targets = apps
+            else:
+                targets = sorted(touched & set(apps))
+            ok = build(targets, False, profile=profile)
+            latency = time.perf_counter() - first_event
+            print(f"{'✅' if ok else '❌'} save -> binary : {latency:.2f}s ({', '.join(targets) or 'core'})")
+            if ok and restart and app:
+                restart_app()
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        if process and process.poll() is None:
+            process.terminate()
+
+
+def bench(app, app_args, runs=30, warmup=3, cpus=None, profile=None, compare=None, save=True):
+    import bench as benchmark
+    if app not in get_apps():
+        print(f"App called {app} doesn't exist.")
+        return False
+    base = None
+    if compare:
+        # Loaded before this run is saved, so it can never be compared with itself
+        base_path, base = benchmark.load_results(app, compare)
+        if base is None:
+            print(f"No saved results matching {compare} in {benchmark.results_dir(app)}.")
+            return False
+    profile = resolve_profile(profile or "release")
+    if not build([app], False, profile=profile):
+        return False
+    exe_path = get_exe_path(app, profile[0])
+    command = [exe_path] + app_args
+    print(f"\nBenchmarking {' '.join(command)} : {warmup} warmup + {runs} runs"
+          + (f", pinned to CPUs {','.join(map(str, cpus))}" if cpus else ""))
+
+    samples = []
+    for i in range(warmup + runs):
+        sample = run_measured(command, cpus=cpus, stdout=subprocess.DEVNULL)
+        if sample["exit_code"] != 0:
+            print(f"Run {i + 1} failed with exit code {sample['exit_code']}.")
+            return False
+        if i >= warmup:
+            samples.append(sample)
+        print(f"\r    run {i + 1}/{warmup + runs}", end="", flush=True)
+    print()
+
+    data = {
+        "app": app,
+        "args": app_args,
+        "profile": profile[0],
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y%m%dT%H%M%S"),
+        "cpus": cpus,
+        "warmup": warmup,
+        "samples": samples,
+    }
+    print(f"\nResults for {app} [{profile[0]}] ({data['revision'] or 'no git revision'}):")
+    benchmark.print_summary(samples)
+    if save:
+        print(f"Saved to {benchmark.save_results(app, data)}")
+    if base is not None:
+        print(f"\nCompared to {base_path} ({base.get('revision') or 'no git revision'}):")
+        benchmark.print_comparison(base, data)
+    return True
+
+
+def size_app(app, profile=None, top=15, compare=None, max_growth=None, save=True):
+    import binsize, deps
+    if app not in get_apps():
+        print(f"App called {app} doesn't exist.")
+        return False
+    profile = resolve_profile(profile or "release")
+    if not build([app], False, profile=profile):
+        return False
+    # FetchContent names ("nlohmann_json") usually start with the library's namespace ("nlohmann")
+    third_party = {dep["name"].split("_")[0] for dep in deps.declared_dependencies()}
+    report = binsize.analyze(get_exe_path(app, profile[0]), third_party)
+    report.update(app=app, profile=profile[0], revision=git_revision(), timestamp=time.strftime("%Y%m%dT%H%M%S"))
+    binsize.print_report(report, top)
+    if not compare:
+        if save:
+            print(f"\nSaved to {binsize.save_report(app, report)}")
+        return True
+
+    # compare is another profile's build, an ELF file, a saved report or a git revision,
+    # resolved before this report is saved so it can't be compared with itself
+    if compare in get_profiles():
+        path = get_exe_path(app, compare)
+        if not os.path.exists(path):
+            print(f"Executable not found: {path} (fcpp build {app} --profile {compare})")
+            return False
+        base = binsize.analyze(path, third_party)
+    elif binsize.is_elf(compare):
+        path, base = compare, binsize.analyze(compare, third_party)
+    else:
+        path, base = binsize.load_report(app, compare)
+        if base is None:
+            print(f"No saved size report matching {compare} in {binsize.results_dir(app)}.")
+            return False
+    if save:
+        print(f"\nSaved to {binsize.save_report(app, report)}")
+    print(f"\nCompared to {path} ({base.get('revision') or 'no git revision'}):")
+    growth = binsize.print_diff(base, report, top)
+    if max_growth is not None and growth > max_growth:
+        print(f"\nLoaded size grew by {growth:.1f}%, more than the allowed {max_growth}%.")
+        return False
+    return True
+
+def profile_app(app, app_args, dwarf=False, frequency=999, top=25):
+    import flamegraph
+    if app not in get_apps():
+        print(f"App called {app} doesn't exist.")
+        return False
+    if not shutil.which("perf"):
+        print("perf not found on PATH (install linux-tools / linux-perf).")
+        return False
+    # Optimized, with debug info and frame pointers so perf can unwind the stacks
+    profile = derive_profile(resolve_profile("relwithdebinfo"), "perf", "-fno-omit-frame-pointer")
+    if not build([app], False, profile=profile):
+        return False
+    out_dir = f"{conf.BUILD_DIR}/profile/{app}"
+    os.makedirs(out_dir, exist_ok=True)
+    perf_data = f"{out_dir}/perf.data"
+    call_graph = ["--call-graph", "dwarf"] if dwarf else ["-g"]
+    command = ["perf", "record", "-F", str(frequency)] + call_graph + ["-o", perf_data, "--",
+                                                                       get_exe_path(app, profile[0])] + app_args
+    print(" ".join(command))
+    exit_code = subprocess.run(command, check=False).returncode
+    if not os.path.exists(perf_data):
+        print("perf record failed (check /proc/sys/kernel/perf_event_paranoid).")
+        return False
+    if exit_code != 0:
+        print(describe_exit_code(exit_code))
+
+    script = subprocess.Popen(["perf", "script", "-i", perf_data], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, errors="replace")
+    folded = flamegraph.fold_perf_script(script.stdout)
+    script.wait()
+    if not folded:
+        print("No samples recorded.")
+        return False
+    total = sum(folded.values())
+    with open(f"{out_dir}/stacks.folded", "w") as f:
+        for stack, count in sorted(folded.items()):
+            f.write(f"{stack} {count}\n")
+    with open(f"{out_dir}/flamegraph.svg", "w") as f:
+        f.write(flamegraph.render_svg(folded, f"{app} ({total} samples)"))
+
+    table = sorted(flamegraph.function_table(folded).items(), key=lambda t: -t[1][0])[:top]
+    lines = [f"{'self':>7} {'incl':>7}  function"]
+    for function, (self_count, inclusive) in table:
+        lines.append(f"{100.0 * self_count / total:6.2f}% {100.0 * inclusive / total:6.2f}%  {function}")
+    with open(f"{out_dir}/top.txt", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"\nTop {top} functions by self time ({total} samples):")
+    for line in lines:
+        print(f"    {line}")
+    print(f"\nFlamegraph : {out_dir}/flamegraph.svg")
+    return True
+
+
+def pgo(app, training_args, profile=None):
+    if app not in get_apps():
+        print(f"App called {app} doesn't exist.")
+        return False
+    profdata_tool = shutil.which("llvm-profdata")
+    if not profdata_tool:
+        print("llvm-profdata not found on PATH (install llvm).")
+        return False
+    base = resolve_profile(profile or "release")
+    gen = derive_profile(base, "pgo-gen", "-fprofile-instr-generate", "-fprofile-instr-generate")
+    profdata = os.path.abspath(f"{get_build_dir(gen[0])}/pgo/{app}.profdata")
+    use = derive_profile(base, "pgo-use", f"-fprofile-instr-use={profdata} -Wno-profile-instr-unprofiled")
+
+    def timed_run(step, run_profile, env=None):
+        print(f"\n== {step} : {app} {' '.join(training_args)}")
+        start = time.perf_counter()
+        exit_code = run(app, run_profile, training_args, env)
+        elapsed = time.perf_counter() - start
+        if exit_code != 0:
+            print(f"Training run failed ({step}).")
+            return None
+        return elapsed
+
+    # 1. Baseline: the regular profile build
+    if not build([app], False, profile=base):
+        return False
+    before = timed_run("baseline run", base)
+    if before is None:
+        return False
+
+    # 2. Instrumented build and training run
+    if not build([app], False, profile=gen):
+        return False
+    raw_dir = os.path.dirname(profdata)
+    shutil.rmtree(raw_dir, ignore_errors=True)
+    os.makedirs(raw_dir)
+    raw_pattern = os.path.join(os.path.abspath(raw_dir), f"{app}-%p.profraw")
+    if timed_run("training run", gen, {"LLVM_PROFILE_FILE": raw_pattern}) is None:
+        return False
+    raw_files = [os.path.join(raw_dir, f) for f in os.listdir(raw_dir) if f.endswith(".profraw")]
+    if not raw_files:
+        print(f"No .profraw files were written to {raw_dir}.")
+        return False
+    subprocess.run([profdata_tool, "merge", f"-output={profdata}"] + raw_files, check=True)
+
+    # 3. Optimized rebuild. Ninja doesn't track the .profdata, so rebuild the tree from scratch.
+    if not build([app], True, profile=use):
+        return False
+    after = timed_run("optimized run", use)
+    if after is None:
+        return False
+
+    print(f"\nPGO summary for {app} [{base[0]}]:")
+    print(f"    profile       : {profdata} ({os.path.getsize(profdata) / 1024:.1f} KiB, {len(raw_files)} raw files)")
+    print(f"    baseline run  : {before:.3f}s")
+    print(f"    optimized run : {after:.3f}s ({100.0 * (before - after) / before:+.1f}%)")
+    print(f"    binary        : {get_build_dir(use[0])}/apps/{app}/{app}")
+    return True
 
 
 def create_project():
     name = input("New project name : ")
     config = get_config()
     config["PROJECT_NAME"] = name
-    config["CLANG_FLAGS"] = "-Wall -Wextra -O2 -g"
+    # Optimization and debug info come from the build profile (see PROFILES)
+    config["CLANG_FLAGS"] = "-Wall -Wextra"
+    config["DEFAULT_PROFILE"] = conf.DEFAULT_PROFILE
+    config["COMPILER_CACHE"] = conf.DEFAULT_COMPILER_CACHE
+    config["LINKER"] = conf.DEFAULT_LINKER
+    modules = input("Use C++20 modules for core (import core;)? (y/N)") in ("y","Y")
+    config["CXX_MODULES"] = modules
     set_config(config)
     os.makedirs("core/src/core",exist_ok=True)
     os.makedirs("core/include/core",exist_ok=True)
@@ -153,9 +727,12 @@ def create_project():
         w.write(conf.DEFAULT_CORECLASSHPP)
     with open("core/include/core/class.hpp","w") as w:
         w.write(conf.DEFAULT_CORECLASSHPP)
+    if modules:
+        with open("core/src/core/core.cppm","w") as w:
+            w.write(conf.DEFAULT_COREMODULE)
     print(f"Project {name} has been created !")
     print(f" - project.config.json added")
-    print(f" - core directory added")
+    print(" - core directory added" + (" (with the core module interface core.cppm)" if modules else ""))
     print(f" - CorePackages.cmake added")
 
 def create_app():
@@ -172,20 +749,303 @@ def create_app():
         return
     if not isinstance(config.get("APPS"),list):
         config["APPS"] = []
+    modules = False
+    if config.get("CXX_MODULES"):
+        modules = input("Scaffold C++20 module interface units for this app? (Y/n)") in ("Y","y","")
     config["APPS"].append(name)
     set_config(config)
     
     os.makedirs(f"apps/{name}/src/subdir")
     os.makedirs(f"apps/{name}/include/subdir")
+    # Module names can't contain "-"
+    module_name = f"{name.replace('-', '_')}.subdir"
     with open(f"apps/{name}/main.cpp","w") as w:
-        w.write(conf.DEFAULT_MAINCPP)
+        w.write(conf.DEFAULT_MAINCPP_MODULES.replace("{{MODULE_NAME}}", module_name) if modules else conf.DEFAULT_MAINCPP)
     with open(f"apps/{name}/src/subdir/class.cpp","w") as w:
         w.write(conf.DEFAULT_CLASSCPP)
     with open(f"apps/{name}/include/subdir/class.hpp","w") as w:
         w.write(conf.DEFAULT_CLASSHPP)
+    if modules:
+        with open(f"apps/{name}/src/subdir/class.cppm","w") as w:
+            w.write(conf.DEFAULT_APPMODULE.replace("{{MODULE_NAME}}", module_name))
     print(f"App {name} has been added !")
     
 
+def create_bench(name=None):
+    name = name or input("New benchmark name : ")
+    if not is_valid_folder_name(name):
+        print(f"The provided name contains unallowed characters. Use only A-Z,a-z,0-9,-,_")
+        return
+    if os.path.exists(f"benchmarks/{name}"):
+        print(f"Benchmark named {name} already exists")
+        return
+    config = get_config()
+    if not isinstance(config.get("BENCHES"),list):
+        config["BENCHES"] = []
+    if name in config["BENCHES"]:
+        print(f"Broken config: The benchmark exists in config but not in the benchmarks directory.")
+        return
+    config["BENCHES"].append(name)
+    set_config(config)
+
+    os.makedirs(f"benchmarks/{name}/include")
+    with open(f"benchmarks/{name}/bench.cpp","w") as w:
+        w.write(conf.DEFAULT_BENCHCPP)
+    print(f"Benchmark {name} has been added ! Run fcpp reload to register it.")
+
+
+def bench_micro(threshold=None, update_baseline=False, bench_filter=None, repetitions=1,
+                metric="real_time", profile=None):
+    config = get_config()
+    benches = config.get("BENCHES") or []
+    if not benches:
+        print("No micro-benchmarks, add one with fcpp create_bench <name>.")
+        return False
+    profile = resolve_profile(profile or "release")
+    build_dir = ensure_configured(*profile)
+    targets = [f"bench_{b}" for b in benches]
+    ok, failures, _ = build_targets(build_dir, targets, default_job_count())
+    if not ok:
+        print(f"Build failed: {next(iter(failures.values()))}")
+        return False
+
+    results = {}
+    out_dir = f"{conf.BUILD_DIR}/bench-micro"
+    os.makedirs(out_dir, exist_ok=True)
+    for bench_name, target in zip(benches, targets):
+        out = f"{out_dir}/{bench_name}.json"
+        command = [f"{build_dir}/benchmarks/{bench_name}/{target}", "--benchmark_format=console",
+                   f"--benchmark_out={out}", "--benchmark_out_format=json",
+                   f"--benchmark_repetitions={repetitions}"]
+        if repetitions > 1:
+            command.append("--benchmark_report_aggregates_only=true")
+        if bench_filter:
+            command.append(f"--benchmark_filter={bench_filter}")
+        if subprocess.run(command, check=False).returncode != 0:
+            print(f"{target} failed.")
+            return False
+        with open(out, "r") as f:
+            for entry in json.load(f).get("benchmarks", []):
+                # With repetitions, compare the medians
+                if repetitions > 1 and entry.get("aggregate_name") != "median":
+                    continue
+                name = entry.get("run_name", entry["name"])
+                results[f"{bench_name}/{name}"] = {"real_time": entry["real_time"], "cpu_time": entry["cpu_time"],
+                                                   "time_unit": entry.get("time_unit", "ns")}
+
+    baseline_path = conf.MICRO_BENCH_BASELINE
+    if update_baseline or not os.path.exists(baseline_path):
+        with open(baseline_path, "w") as f:
+            f.write(json.dumps({"revision": git_revision(), "results": results}, indent=2))
+        print(f"Baseline written to {baseline_path} ({len(results)} benchmarks).")
+        return True
+
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    threshold = threshold if threshold is not None else config.get("BENCH_THRESHOLD_PCT", conf.DEFAULT_BENCH_THRESHOLD_PCT)
+    print(f"\nCompared to baseline {baseline_path} ({baseline.get('revision') or 'no git revision'}), "
+          f"{metric}, threshold {threshold}%:")
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"    {name:<48} {current[metric]:>12.1f} {current['time_unit']}  (new)")
+            continue
+        change = 100.0 * (current[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"    {name:<48} {base[metric]:>12.1f} -> {current[metric]:>12.1f} {current['time_unit']} "
+              f"{change:+7.1f}%" + ("  REGRESSION" if regressed else ""))
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {threshold}%.")
+    return not regressions
+
+
+def deps_prefetch(build=False, profile=None):
+    import deps
+    declared = deps.declared_dependencies()
+    if not declared:
+        print("No FetchContent dependencies declared.")
+        return True
+    print(f"Dependency store : {deps.store_dir()}")
+    ok = True
+    for dep in declared:
+        cached = os.path.isdir(deps.source_dir(dep))
+        name = f"{dep['name']}@{dep['tag']}"
+        if not cached and not deps.prefetch_source(dep):
+            print(f"    {name:<32} FAILED to clone {dep['repository']}")
+            ok = False
+            continue
+        print(f"    {name:<32} {'cached' if cached else 'fetched'}")
+    if build:
+        profile, settings = resolve_profile(profile)
+        build_type = settings.get("BUILD_TYPE", "Debug")
+        cxx_flags = profile_cxx_flags(get_config(), settings)
+        key, _ = deps.prebuilt_key("clang++", build_type, cxx_flags)
+        print(f"Prebuilding for profile {profile} ({build_type}, key {key}) :")
+        for dep in declared:
+            if not os.path.isdir(deps.source_dir(dep)):
+                continue
+            built = deps.build_prebuilt(dep, "clang++", build_type, cxx_flags)
+            print(f"    {dep['name'] + '@' + dep['tag']:<32} {'installed' if built else 'FAILED'}")
+            ok = ok and built
+    print("Run fcpp reload to use the store in existing build trees." if ok else "Some dependencies failed.")
+    return ok
+
+def project_prebuilt_keys():
+    import deps
+    config = get_config()
+    return {deps.prebuilt_key("clang++", settings.get("BUILD_TYPE", "Debug"), profile_cxx_flags(config, settings))[0]
+            for settings in get_profiles().values()}
+
+def deps_list():
+    import deps
+    keys = project_prebuilt_keys()
+    found = deps.entries()
+    print(f"Dependency store : {deps.store_dir()}")
+    if not found:
+        print("    empty, run fcpp deps prefetch")
+        return
+    total = 0
+    for kind, name, path, last_used in found:
+        size = deps.dir_size(path)
+        total += size
+        used = "*" if deps.referenced(name, kind, keys) else " "
+        detail = ""
+        if kind == "prebuilt":
+            key_file = deps.load_key_file(path)
+            installed = ", ".join(f"{n}@{t}" for n, t in sorted(key_file.get("installed", {}).items()))
+            detail = f"  {key_file.get('build_type', '?')} {key_file.get('cxx_flags', '')!r} [{installed}]"
+        print(f"  {used} {kind:<9} {name:<32} {size / 2**20:8.1f} MiB  "
+              f"used {time.strftime('%Y-%m-%d', time.localtime(last_used))}{detail}")
+    print(f"    {total / 2**20:.1f} MiB total, * = used by this project")
+
+def deps_prune(days=None):
+    import deps
+    days = days if days is not None else conf.DEFAULT_DEPS_PRUNE_DAYS
+    removed = deps.prune(days, project_prebuilt_keys())
+    for kind, name, size in removed:
+        print(f"    removed {kind:<9} {name:<32} {size / 2**20:8.1f} MiB")
+    print(f"Pruned {len(removed)} entries unused for {days} days ({sum(r[2] for r in removed) / 2**20:.1f} MiB).")
+
+
+def load_include_graph():
+    import includes
+    try:
+        with open(conf.INCLUDE_GRAPH_CACHE, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if cache.get("version") != conf.INCLUDE_GRAPH_VERSION:
+        cache = {"version": conf.INCLUDE_GRAPH_VERSION}
+    index = load_discovery_index()
+    files = includes.project_source_files(index)
+    save_discovery_index(index)
+    graph, scanned = includes.include_graph(files, includes.project_include_dirs(), cache)
+    os.makedirs(os.path.dirname(conf.INCLUDE_GRAPH_CACHE), exist_ok=True)
+    with open(conf.INCLUDE_GRAPH_CACHE, "w") as f:
+        json.dump(cache, f)
+    return graph, scanned
+
+def what_rebuilds(graph, changed):
+    import includes
+    changed = os.path.normpath(changed).replace("\\", "/")
+    if changed not in graph:
+        print(f"{changed} is not part of the include graph of core/ and apps/.")
+        return False
+    tus = includes.dependents(graph, changed)
+    config = get_config()
+    components = get_core_components(config)
+    by_target = {}
+    for tu in tus:
+        target = includes.owning_target(tu)
+        if target == "core" and components is not None:
+            parts = tu.split("/")
+            target = f"core_{parts[2] if len(parts) > 3 and parts[1] == 'src' else conf.CORE_COMMON_COMPONENT}"
+        by_target.setdefault(target, []).append(tu)
+    # core is linked into every app, so any core change relinks all of them;
+    # a split core only relinks the apps using the changed components
+    relinked = set(by_target)
+    for app in get_apps() + [f"bench_{b}" for b in config.get("BENCHES") or []]:
+        if "core" in relinked or (components is not None and relinked & {
+                f"core_{c}" for c in get_app_components(config, components, app)}):
+            relinked.add(app)
+    print(f"Changing {changed} recompiles {len(tus)} TUs and relinks {len(relinked)} targets:")
+    for target, files in sorted(by_target.items()):
+        print(f"    {target} ({len(files)})")
+        for tu in files:
+            print(f"        {tu}")
+    for target in sorted(relinked - set(by_target)):
+        print(f"    {target} (relink only)")
+    return True
+
+def deps_graph(top=20, dot_path=None, json_path=None, changed=None, profile=None):
+    import buildstats, includes
+    start = time.perf_counter()
+    graph, scanned = load_include_graph()
+    if changed:
+        ok = what_rebuilds(graph, changed)
+        print(f"({(time.perf_counter() - start) * 1000:.1f} ms, {scanned} files rescanned)")
+        return ok
+
+    reach = includes.closures(graph)
+    tus = [path for path in graph if includes.is_translation_unit(path)]
+    # Compile time of each TU from the last build of the profile, when there is one
+    compile_ms = {}
+    for output, (begin, end) in buildstats.parse_ninja_log(get_build_dir(resolve_profile(profile)[0])).items():
+        source = includes.object_source(output) if output.endswith(buildstats.COMPILE_SUFFIXES) else None
+        if source:
+            compile_ms[source] = end - begin
+    headers = {}
+    for tu in tus:
+        for header in reach.get(tu, ()):
+            count, cost = headers.get(header, (0, 0))
+            headers[header] = (count + 1, cost + compile_ms.get(tu, 0))
+    edges = sum(len(h) for h in graph.values())
+    print(f"Include graph: {len(graph)} files, {edges} includes, {len(tus)} TUs "
+          f"({scanned} files rescanned, {(time.perf_counter() - start) * 1000:.1f} ms)")
+    if not compile_ms:
+        print("No compile times in .ninja_log yet (fcpp build first), ranking by dependent TUs only.")
+
+    ranked = sorted(headers.items(), key=lambda item: (-item[1][1], -item[1][0], item[0]))
+    print("\nHeaders by rebuild cost (dependent TUs x their compile time):")
+    print(f"    {'cost (s)':>9} {'TUs':>5}  header")
+    for header, (count, cost) in ranked[:top]:
+        print(f"    {cost / 1000:9.2f} {count:>5}  {header}")
+
+    redundant = includes.redundant_includes(graph, reach)
+    if redundant:
+        print(f"\nRedundant includes ({len(redundant)}), already brought in by another include of the file:")
+        for path, header, via in redundant[:top]:
+            print(f"    {path}: {header} " + (f"(via {via})" if via else "(included twice)"))
+
+    if dot_path or json_path:
+        nodes = {path: {"tus": headers.get(path, (0, 0))[0], "cost_ms": headers.get(path, (0, 0))[1],
+                        "compile_ms": compile_ms.get(path), "target": includes.owning_target(path)} for path in graph}
+    if dot_path:
+        with open(dot_path, "w") as f:
+            f.write("digraph includes {\n    rankdir=LR;\n    node [shape=box, fontsize=10];\n")
+            for path, node in sorted(nodes.items()):
+                if includes.is_translation_unit(path):
+                    detail = f"compile {(node['compile_ms'] or 0) / 1000:.2f}s"
+                    f.write(f'    "{path}" [shape=ellipse, label="{path}\\n{detail}"];\n')
+                else:
+                    detail = f"{node['tus']} TUs, {node['cost_ms'] / 1000:.2f}s"
+                    f.write(f'    "{path}" [label="{path}\\n{detail}"];\n')
+            for path, targets in sorted(graph.items()):
+                for header in targets:
+                    f.write(f'    "{path}" -> "{header}";\n')
+            f.write("}\n")
+        print(f"\nDOT graph written to {dot_path}")
+    if json_path:
+        with open(json_path, "w") as f:
+            f.write(json.dumps({"nodes": nodes, "edges": graph,
+                                "redundant": [{"file": p, "header": h, "via": v} for p, h, v in redundant]}, indent=2))
+        print(f"JSON graph written to {json_path}")
+    return True
+
+
 def add_external_dependency():
     print("Deprecated. Exiting...")
     return
@@ -228,11 +1088,136 @@ def add_external_dependency():
     print("Dependency added in .project.config.json")
 
 
-def render_cmake_files():
+def render_target_properties(config, target, files):
+    s = ""
+    unity = get_target_setting(config, target, "UNITY_BUILD", conf.DEFAULT_UNITY_BUILD)
+    if unity.get("ENABLED"):
+        excluded = [f for f in files if any(fnmatch.fnmatch(f, p) for p in unity.get("EXCLUDE", []))]
+        s += "\nif(FCPP_UNITY_BUILD)\n"
+        s += f"    set_target_properties({target} PROPERTIES UNITY_BUILD ON UNITY_BUILD_BATCH_SIZE {unity.get('BATCH_SIZE', 0)})\n"
+        if excluded:
+            s += "    set_source_files_properties(\n"
+            for f in excluded:
+                s += f"        \"{f}\"\n"
+            s += "        PROPERTIES SKIP_UNITY_BUILD_INCLUSION ON)\n"
+        s += "endif()\n"
+
+    pch = get_target_setting(config, target, "PCH", conf.DEFAULT_PCH)
+    if pch.get("ENABLED"):
+        headers = pch.get("HEADERS", [])[:pch.get("TOP_N")]
+        core_pch = get_target_setting(config, "core", "PCH", conf.DEFAULT_PCH)
+        core_headers = core_pch.get("HEADERS", [])[:core_pch.get("TOP_N")]
+        # Reusing core's PCH needs a compatible header set; otherwise the app gets its own
+        reuse = (target != "core" and pch.get("REUSE_FROM_CORE") and get_core_components(config) is None and core_pch.get("ENABLED")
+                 and core_headers and set(headers) <= set(core_headers))
+        if reuse:
+            s += f"\nif(FCPP_PCH)\n    target_precompile_headers({target} REUSE_FROM core)\nendif()\n"
+        elif headers:
+            s += f"\nif(FCPP_PCH)\n    target_precompile_headers({target} PRIVATE\n"
+            for h in headers:
+                s += f"        \"<{h.strip('<>')}>\"\n"
+            s += "    )\nendif()\n"
+    return s
+
+
+def render_module_sources(config, target, dir_name, index, base_dir=None, modules=None):
+    # .cppm interface units, only built when the project opts into C++20 modules
+    if not config.get("CXX_MODULES"):
+        return ""
+    base_dir = base_dir or dir_name
+    if modules is None:
+        modules = find_source_files(dir_name, ".cppm", index)
+    modules = [f[len(base_dir) + 1:] for f in modules]
+    if not modules:
+        return ""
+    public = target == "core" or target.startswith("core_")
+    s = "\n# C++20 module interface units\nif(FCPP_CXX_MODULES)\n"
+    s += f"    target_sources({target} {'PUBLIC' if public else 'PRIVATE'} FILE_SET CXX_MODULES FILES\n"
+    for f in modules:
+        s += f"        \"{f}\"\n"
+    s += "    )\n"
+    if public:
+        s += f"    target_compile_definitions({target} PUBLIC FCPP_USE_MODULES)\n"
+    s += "endif()\n"
+    return s
+
+
+def render_app_tests(appname, files, tests, core_link="core"):
+    if not tests:
+        return ""
+    s = "# Tests (apps/" + appname + "/tests/*.cpp)\nset(SRC_FILES_APP_TESTED\n"
+    for f in files:
+        if f != "main.cpp":
+            s += f"    \"{f}\"\n"
+    s += "    )\n"
+    for test_file in tests:
+        stem = os.path.splitext(test_file[len("tests/"):])[0].replace("/", "_")
+        s += (conf.CMAKELISTS_APP_TEST.replace("{{TEST_TARGET}}", f"{appname}_test_{stem}")
+              .replace("{{TEST_FILE}}", test_file)
+              .replace("{{TEST_NAME}}", f"{appname}.{stem}")
+              .replace("{{CORE_LINK}}", core_link))
+    return s + "\n"
+
+
+def core_component_of(path):
+    # Component of a file relative to core/: core/src/<component>/..., the rest is "common"
+    parts = path.split("/")
+    return parts[1] if len(parts) > 2 and parts[0] == "src" else conf.CORE_COMMON_COMPONENT
+
+
+def core_link(config, components, target):
+    # What an app links: core, or the components it uses with their dependencies (maybe none).
+    # They are all listed because OBJECT libraries don't pass their objects on.
+    if components is None:
+        return "core"
+    return " ".join(f"core_{c}" for c in get_app_components(config, components, target))
+
+
+def render_core_components(config, components, corefiles, packages, index):
+    import re
+    for name, deps in sorted(components.items()):
+        for dep in deps:
+            if dep not in components:
+                print(f"Warning: core component {name} depends on unknown component {dep}")
+    modules = find_source_files("core", ".cppm", index) if config.get("CXX_MODULES") else []
+    s = ""
+    for name in sorted(components):
+        files = [f for f in corefiles if core_component_of(f) == name]
+        target = f"core_{name}"
+        deps = "".join(f" core_{d}" for d in components[name] if d in components)
+        if files:
+            src = "".join(f"    \"{f}\"\n" for f in files)
+            s += (conf.CMAKELISTS_CORE_COMPONENT.replace("{{SRC_FILES}}", src)
+                  .replace("{{DEPENDENCIES}}", deps)
+                  .replace("{{TARGET_PROPERTIES}}", render_target_properties(config, target, files) + render_module_sources(
+                      config, target, "core", index, "core", [m for m in modules if core_component_of(m[len("core/"):]) == name]))
+                  .replace("{{COMPONENT}}", name))
+        else:
+            # Header-only component
+            s += f"\n# core/src/{name}\nadd_library({target} INTERFACE)\ntarget_link_libraries({target} INTERFACE core_external{deps})\n"
+    # CorePackages.cmake configures "core", which is only an aggregate here
+    packages = re.sub(r"\b(target_\w+)\(\s*core\s+(PUBLIC|PRIVATE|INTERFACE)\b", r"\1(core_external INTERFACE", packages)
+    rendered = conf.CMAKELISTS_CORE_COMPONENTS.replace("{{LIBRARIES}}", packages)
+    rendered = rendered.replace("{{COMPONENTS}}", s)
+    rendered = rendered.replace("{{ALL_COMPONENTS}}", "".join(f" core_{c}" for c in sorted(components)))
+    built = [c for c in sorted(components) if any(core_component_of(f) == c for f in corefiles)]
+    return rendered.replace("{{ALL_OBJECTS}}", "".join(f" $<TARGET_OBJECTS:core_{c}>" for c in built))
+
+
+def render_cmake_files(verbose=False):
     config = get_config()
+    index = load_discovery_index()
     
     mr = conf.CMAKELISTS_ROOT
     rendered = mr.replace("{{PROJ_NAME}}",config["PROJECT_NAME"])
+    if config.get("CXX_MODULES"):
+        # A version range: older CMake can still configure the header layout (FCPP_CXX_MODULES=OFF)
+        rendered = rendered.replace("{{CMAKE_MINIMUM_VERSION}}",
+                                    f"{conf.CMAKE_MINIMUM_VERSION}...{conf.CXX_MODULES_CMAKE_MINIMUM_VERSION}")
+        rendered = rendered.replace("{{CXX_MODULES}}", conf.CMAKELISTS_MODULES_OPTION)
+    else:
+        rendered = rendered.replace("{{CMAKE_MINIMUM_VERSION}}", conf.CMAKE_MINIMUM_VERSION)
+        rendered = rendered.replace("{{CXX_MODULES}}", "")
     
     if isinstance(config.get("EXTERNAL_DEPENDENCIES"),list) and False:
         s = ""
@@ -255,17 +1240,26 @@ FetchContent_MakeAvailable({dep["ALIAS"]})
         rendered = rendered.replace("{{APP_INCLUSIONS}}", s)
     else:
         rendered = rendered.replace("{{APP_INCLUSIONS}}", "")
+    if config.get("BENCHES"):
+        s = conf.CMAKELISTS_BENCH_DEPENDENCY
+        for benchname in config["BENCHES"]:
+            s += f"add_subdirectory(benchmarks/{benchname})\n"
+        rendered = rendered.replace("{{BENCH_INCLUSIONS}}", s)
+    else:
+        rendered = rendered.replace("{{BENCH_INCLUSIONS}}", "")
                 
     
-    with open("CMakeLists.txt","w") as mw:
-        mw.write(rendered)
+    rendered_files = [("root", "CMakeLists.txt", rendered)]
         
-    corefiles = find_cpp_files("core")
+    corefiles = find_cpp_files("core", verbose, index)
+    components = get_core_components(config)
     s = ""
     for f in corefiles:
         s += f"    \"{f}\"\n"
     cr = conf.CMAKELISTS_CORE
     rendered = cr.replace("{{SRC_FILES}}",s)
+    rendered = rendered.replace("{{TARGET_PROPERTIES}}", render_target_properties(config, "core", corefiles)
+                                + render_module_sources(config, "core", "core", index))
     if isinstance(config.get("EXTERNAL_DEPENDENCIES"),list) and False:
         s = ""
         for dep in config["EXTERNAL_DEPENDENCIES"]:
@@ -277,29 +1271,172 @@ FetchContent_MakeAvailable({dep["ALIAS"]})
         rendered = rendered.replace("{{LIBRARIES}}",s)
     else:
         with open("CorePackages.cmake","r") as cp:
-            rendered = rendered.replace("{{LIBRARIES}}", cp.read())
+            packages = cp.read()
+        if components is None:
+            rendered = rendered.replace("{{LIBRARIES}}", packages)
+        else:
+            rendered = render_core_components(config, components, corefiles, packages, index)
                 
  
-    with open("core/CMakeLists.txt","w") as cw:
-        cw.write(rendered)
+    rendered_files.append(("core", "core/CMakeLists.txt", rendered))
     
     if isinstance(config.get("APPS"),list):
         for appname in config["APPS"]:
-            files = find_cpp_files(f"apps/{appname}")
+            files = find_cpp_files(f"apps/{appname}", verbose, index)
+            tests = [f for f in files if f.startswith("tests/")]
+            files = [f for f in files if not f.startswith("tests/")]
             s = ""
             for f in files:
                 s += f"    \"{f}\"\n"
             ar = conf.CMAKELISTS_APP
             rendered = ar.replace("{{SRC_FILES}}",s)
+            rendered = rendered.replace("{{TARGET_PROPERTIES}}", render_target_properties(config, appname, files)
+                                        + render_module_sources(config, appname, f"apps/{appname}", index))
+            rendered = rendered.replace("{{TESTS}}", render_app_tests(appname, files, tests, core_link(config, components, appname)))
+            rendered = rendered.replace("{{CORE_LINK}}", core_link(config, components, appname))
             rendered = rendered.replace("{{APP_NAME}}", appname)
-            with open(f"apps/{appname}/CMakeLists.txt","w") as aw:
-                aw.write(rendered)
-    
+            rendered_files.append((appname, f"apps/{appname}/CMakeLists.txt", rendered))
+    for benchname in config.get("BENCHES") or []:
+        files = find_cpp_files(f"benchmarks/{benchname}", verbose, index)
+        s = ""
+        for f in files:
+            s += f"    \"{f}\"\n"
+        rendered = conf.CMAKELISTS_BENCH.replace("{{SRC_FILES}}", s)
+        rendered = rendered.replace("{{TARGET_PROPERTIES}}", render_target_properties(config, f"bench_{benchname}", files))
+        rendered = rendered.replace("{{CORE_LINK}}", core_link(config, components, f"bench_{benchname}"))
+        rendered = rendered.replace("{{BENCH_NAME}}", benchname)
+        rendered_files.append((f"bench_{benchname}", f"benchmarks/{benchname}/CMakeLists.txt", rendered))
+    save_discovery_index(index)
+
+    # Only touch files whose content changed, so their mtime stays put and
+    # Ninja doesn't re-run the whole CMake configure step for nothing.
+    touched = []
+    for target, path, content in rendered_files:
+        if write_if_changed(path, content):
+            touched.append(target)
+            print(f"  updated {path}")
+    if touched:
+        print(f"CMake files rendered, touched targets : {', '.join(touched)}")
+    else:
+        print("CMake files are up to date.")
+    return touched
 
-def test():
+def pch_analyze(top=None, save=False):
+    import includes
+    config = get_config()
+    pch = dict(conf.DEFAULT_PCH, **(config.get("PCH") or {}))
+    top = top or pch["TOP_N"]
+    files = includes.project_source_files()
+    ranking = includes.rank_external_headers(files)
+    if not ranking:
+        print(f"No external headers included in {len(files)} files.")
+        return
+    print(f"Most included external headers ({len(files)} files scanned):")
+    print(f"    {'#':>3}  {'files':>5}  {'kind':<12} header")
+    for i, (header, count) in enumerate(ranking[:top], 1):
+        print(f"    {i:>3}  {count:>5}  {includes.header_kind(header):<12} <{header}>")
+    if save:
+        pch["HEADERS"] = [header for header, _ in ranking[:top]]
+        pch["ENABLED"] = True
+        config["PCH"] = pch
+        set_config(config)
+        print("PCH headers saved in .project.config.json, run fcpp reload to apply them.")
+
+
+def build_stats(profile=None, top=15):
+    import buildstats
+    profile, settings = resolve_profile(profile)
+    # Prefer the tree built with "fcpp build --trace", which has the -ftime-trace files
+    name = f"{profile}-trace" if os.path.exists(f"{get_build_dir(profile + '-trace')}/.ninja_log") else profile
+    build_dir = get_build_dir(name)
+    entries = buildstats.parse_ninja_log(build_dir)
+    if not entries:
+        print(f"No .ninja_log in {build_dir}, build first (fcpp build --trace for header/template stats).")
+        return
+    compiles, links = buildstats.split_steps(entries)
+    stats = buildstats.aggregate(build_dir, compiles)
+    print(f"Build statistics for {build_dir} ({len(compiles)} compile steps, "
+          f"{len(links)} link steps, {stats['traced']} time traces)")
+
+    print("\nSlowest translation units:")
+    for output, _, duration in sorted(compiles, key=lambda s: -s[2])[:top]:
+        print(f"    {duration / 1000:8.2f}s  {output}")
+    print("\nLink / archive steps:")
+    for output, _, duration in sorted(links, key=lambda s: -s[2])[:top]:
+        print(f"    {duration / 1000:8.2f}s  {output}")
+    if stats["traced"]:
+        print("\nMost expensive headers (parse time summed across TUs):")
+        for header, (total, count) in sorted(stats["headers"].items(), key=lambda h: -h[1][0])[:top]:
+            print(f"    {total / 1e6:8.2f}s  {count:>5} TUs  {buildstats.display_path(header)}")
+        print("\nSlowest template instantiations (summed):")
+        for template, (total, count) in sorted(stats["templates"].items(), key=lambda t: -t[1][0])[:top]:
+            print(f"    {total / 1e6:8.2f}s  {count:>5}x  {template[:120]}")
+    else:
+        print("\nNo -ftime-trace files found, run fcpp build --trace for header and template stats.")
+
+    trace_path = f"{conf.BUILD_DIR}/buildstats/{name}.json"
+    buildstats.write_chrome_trace(build_dir, compiles, links, trace_path)
+    print(f"\nChrome trace written to {trace_path} (open in chrome://tracing or ui.perfetto.dev)")
+
+
+def cache_stats():
+    config = get_config()
+    launcher = find_compiler_cache(config.get("COMPILER_CACHE", conf.DEFAULT_COMPILER_CACHE))
+    if not launcher:
+        print("No compiler cache configured (COMPILER_CACHE in .project.config.json) or found on PATH.")
+        return
+    stats = compiler_cache_stats(launcher)
+    if stats is None:
+        print(f"Could not read statistics from {launcher}.")
+        return
+    hits, misses, size = stats
+    total = hits + misses
+    rate = f"{100.0 * hits / total:.1f}%" if total else "n/a"
+    print(f"Compiler cache : {launcher}")
+    print(f"    hits       : {hits}")
+    print(f"    misses     : {misses}")
+    print(f"    hit rate   : {rate}")
+    if size is not None:
+        print(f"    size       : {size / (1024 * 1024):.1f} MiB")
+
+
+def test(profile=None, sanitize=None, jobs=None, shard=None, timeout=None, junit=None, tests_regex=None):
     print("Running tests...")
-    # Placeholder: Add your test runner here
-    subprocess.run(["ctest", "--output-on-failure"], cwd="build", check=True)
+    env = None
+    if sanitize:
+        import sanitizers
+        names = sanitizers.parse_sanitize(sanitize)
+        profile = sanitizers.sanitizer_profile(profile, names)
+        env = dict(os.environ, **sanitizers.sanitizer_env(names, profile))
+    profile = resolve_profile(profile)
+    build_dir = ensure_configured(*profile)
+    jobs = jobs or default_job_count()
+    # The test executables aren't part of the per-app targets, build everything
+    ok, failures, _ = build_targets(build_dir, ["all"], jobs)
+    if not ok:
+        print(f"Build failed: {next(iter(failures.values()))}")
+        return False
+
+    # ctest keeps each test's last duration in Testing/Temporary/CTestCostData.txt
+    # and, with -j, starts the longest tests first.
+    command = ["ctest", "--output-on-failure", "-j", str(jobs)]
+    if shard:
+        index, count = shard
+        # Every count-th test starting at index, in the (stable) registration order
+        command.extend(["-I", f"{index},,{count}"])
+    if timeout:
+        command.extend(["--timeout", str(timeout)])
+    if junit:
+        command.extend(["--output-junit", os.path.abspath(junit)])
+    if tests_regex:
+        command.extend(["-R", tests_regex])
+    completed = subprocess.run(command, cwd=build_dir, env=env, check=False)
+    if sanitize and sanitizers.summarize(profile):
+        return False
+    if completed.returncode != 0:
+        print(f"Tests failed (ctest exit code {completed.returncode}).")
+        return False
+    return True
 
 
 def clean():
@@ -311,30 +1448,92 @@ def clean():
         print(f"No such directory: {conf.BUILD_DIR}")
 
 
-def format_code():
-    print("Formatting code...")
-    subprocess.run(["clang-format", "-i", "*.cpp", "*.h"])
+def format_code(check=False, jobs=None):
+    import formatting
+    from concurrent.futures import ThreadPoolExecutor
+    if not shutil.which("clang-format"):
+        print("clang-format not found on PATH.")
+        return False
+    cache = formatting.load_cache()
+    files = formatting.format_targets()
+    # Files identical to what the last format produced don't need clang-format again
+    pending = [f for f in files if cache["files"].get(f) != formatting.digest(f)]
+    jobs = jobs or os.cpu_count() or 1
+    print(f"{'Checking' if check else 'Formatting'} {len(pending)} of {len(files)} files "
+          f"({len(files) - len(pending)} unchanged since last format)...")
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        if check:
+            results = list(pool.map(formatting.check_file, pending))
+            for path, changed in results:
+                if changed == 0:
+                    cache["files"][path] = formatting.digest(path)
+        else:
+            for batch, batch_ok in pool.map(formatting.format_batch, formatting.batches(pending, jobs)):
+                ok = ok and batch_ok
+                for path in batch if batch_ok else []:
+                    cache["files"][path] = formatting.digest(path)
+    formatting.save_cache(cache)
+
+    if check:
+        failed = [path for path, changed in results if changed is None]
+        unformatted = [(path, changed) for path, changed in results if changed]
+        for path, changed in unformatted:
+            print(f"    {path}: {changed} line(s) would change")
+        if failed:
+            print(f"clang-format failed on {len(failed)} file(s).")
+        elif not unformatted:
+            print("All files are formatted.")
+        if unformatted:
+            print(f"{len(unformatted)} file(s) need formatting.")
+        return not unformatted and not failed
+    print("Formatting complete." if ok else "Formatting failed for some files, see above.")
+    return ok
     
-def clangtidyfile():
-    os.makedirs(conf.BUILD_DIR,exist_ok=True)
-    with open(f"{conf.BUILD_DIR}/clangtidy.sh","w") as ct:
-        ct.write("""
-#!/bin/bash
-CHECKS='-checks=bugprone-*,performance-*,modernize-*'
-# Find the source file in the arguments
-exec clang-tidy $CHECKS "$@"
-
-# If no .cpp file found, just skip
-exit 0
-                 """)
-    os.system(f"chmod +x {conf.BUILD_DIR}/clangtidy.sh")
-
-def reload():
-    render_cmake_files()
+def tidy(app=None, changed=False, jobs=None, profile=None):
+    import tidy as clangtidy
+    from concurrent.futures import ThreadPoolExecutor
+    if app and app != "core" and app not in get_apps():
+        print(f"App called {app} doesn't exist.")
+        return False
+    if not shutil.which("clang-tidy"):
+        print("clang-tidy not found on PATH.")
+        return False
+    profile, settings = resolve_profile(profile)
+    build_dir = ensure_configured(profile, settings)
+    checks = get_config().get("CLANG_TIDY_CHECKS", conf.DEFAULT_TIDY_CHECKS)
+    commands = clangtidy.load_compile_commands(build_dir)
+    units = clangtidy.select_units(commands, app, clangtidy.changed_files() if changed else None)
+    if not units:
+        print("No translation units to check.")
+        return True
+
+    cache = clangtidy.load_cache()
+    digests = {}
+    keys = {path: clangtidy.tu_key(path, commands[path], checks, headers, digests) for path, headers in units.items()}
+    results = {path: cache[path] for path, key in keys.items() if cache.get(path, {}).get("key") == key}
+    pending = [path for path in units if path not in results]
+    print(f"clang-tidy on {len(units)} TUs ({len(results)} cached, {len(pending)} to check) with {checks}")
+
+    jobs = jobs or default_job_count()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for i, (path, findings, output) in enumerate(
+                pool.map(lambda p: clangtidy.run_clang_tidy(p, build_dir, checks), pending), 1):
+            results[path] = cache[path] = {"key": keys[path], "findings": findings, "output": output}
+            print(f"[{i}/{len(pending)}] {'✅' if not findings else '⚠️'} {path}")
+    clangtidy.save_cache(cache)
+
+    flagged = sorted(path for path, result in results.items() if result["findings"])
+    for path in flagged:
+        print(f"\n{results[path]['output']}")
+    print(f"\n{sum(results[p]['findings'] for p in flagged)} finding(s) in {len(flagged)} of {len(units)} TUs.")
+    return not flagged
+
+def reload(verbose=False, compiler_cache=None, profile=None):
+    render_cmake_files(verbose)
     print("- CMake files have been rendered.")
-    #clangtidyfile()
-    #print("- Clangtidy file has been copied to build dir.")
-    cmake_gen()
+    cmake_gen(compiler_cache, profile)
     print("- CMake build directory has been created.")
     render_debug_config_vscode()
     print("- Debug configuration for vscode has been added.")
@@ -359,14 +1558,72 @@ def help():
     print("""
           fcpp create_app       ->    To add a new app
           fcpp build            ->    To build the entire project
-          fcpp build <app>      ->    To build a specific app
+          fcpp build <app> ...  ->    To build specific apps
+          fcpp build -j N -l L  ->    Limit parallel jobs / load average (-k to keep going after failures)
           fcpp fbuild           ->    To force build the entire project
-          fcpp fbuild <app>     ->    To force build a specific app
+          fcpp fbuild <app> ... ->    To force build specific apps
+          fcpp build --compare-unity -> To compare clean-build times with and without unity builds
+                                      (enable with "UNITY_BUILD": {"ENABLED": true, "BATCH_SIZE": 8,
+                                      "EXCLUDE": ["src/legacy/*"]} in .project.config.json, or per
+                                      target under "TARGET_SETTINGS")
+          fcpp build --compare-modules -> To compare clean-build times of the header and C++20
+                                      module layouts ("CXX_MODULES": true, chosen at create_project)
           fcpp run <app>        ->    To run a specific app
+          fcpp build --sanitize address,undefined
+                                ->    To build with sanitizers in build/<profile>-asan-ubsan (also
+                                      thread, memory, leak); run/test --sanitize use that build
+                                      and summarize the unique issues reported
+          fcpp run <app> -- <args> -> To run it with arguments (--timeout S, --json [FILE] for the
+                                      exit status and resource usage as JSON, on stderr by default)
+          --profile <name>      ->    For build/fbuild/run/test/reload: use a build profile
+                                      (debug, release, relwithdebinfo, lto, native or one
+                                      defined under "PROFILES" in .project.config.json),
+                                      each built in its own build/<profile> directory
+                                      ("CORE_LIBRARY_TYPE": "STATIC", "SHARED" or "OBJECT" per profile)
+          "CORE_COMPONENTS": {"net": ["util"]}
+                                ->    In .project.config.json: build each core/src/<component> as
+                                      core_<component> (with its dependencies, and "common" for the
+                                      files directly under core/src); apps pick theirs with
+                                      "TARGET_SETTINGS": {"<app>": {"CORE_COMPONENTS": ["net"]}}
+                                      ([] for none, all of them when unset)
+          fcpp watch [app]      ->    To rebuild (and with -r restart) an app whenever sources change
+          fcpp bench <app> -n 30 --warmup 3 -- <args>
+                                ->    To benchmark an app (wall/CPU time, peak RSS), saved under
+                                      build/bench/; --compare <file|git rev> for a significance test
+          fcpp profile <app> -- <args>
+                                ->    To sample an app with perf and write a flamegraph and top
+                                      functions table to build/profile/<app>/
+          fcpp create_bench <name> -> To add a Google Benchmark micro-benchmark linked to core
+          fcpp bench-micro      ->    To run all micro-benchmarks (release) and fail on regressions
+                                      against benchmarks/baseline.json (--update-baseline)
+          fcpp deps prefetch    ->    To clone FetchContent dependencies into ~/.cache/fcpp/deps (--build to prebuild)
+          fcpp deps list|prune  ->    To show / clean the machine-wide dependency store
+          fcpp deps graph       ->    To rank headers by rebuild cost, find redundant includes (--dot/--json)
+          fcpp deps graph --what-rebuilds <file> -> To list what a change to <file> recompiles
+          fcpp --startup-bench  ->    To measure cold/warm startup time of fcpp itself (--drop-caches as root for a true cold start)
+          fcpp size <app>       ->    To break the binary size down by section, namespace, template,
+                                      source file and origin (core / third-party / std)
+          fcpp size <app> --compare <profile|file|revision> --max-growth 5
+                                ->    To diff with another build or saved report, failing on >5% growth
+          fcpp pgo <app> -- <args> ->  To build <app> with profile-guided optimization, training
+                                      it with <args> (base profile: release, see --profile)
+          fcpp build --trace    ->    To build with -ftime-trace in build/<profile>-trace
+          fcpp buildstats       ->    To report the slowest TUs, headers, template instantiations
+                                      and links, and write a merged Chrome trace
+          fcpp test             ->    To build and run the tests (apps/<app>/tests/*.cpp, one
+                                      executable each) in parallel, longest first; --shard i/n,
+                                      --timeout S and --junit report.xml for CI
+          fcpp format           ->    To clang-format core/ and apps/ in parallel (--check for CI)
+          fcpp tidy [app]       ->    To run clang-tidy in parallel over compile_commands.json,
+                                      skipping unchanged TUs (--changed: only files changed in git)
+          fcpp pch analyze      ->    To rank the most included external headers (--save to
+                                      precompile the top ones for core, reused by the apps)
+          fcpp cache stats      ->    To show compiler cache (ccache/sccache) hit rate and size
           fcpp reload           ->    To regenerate configuration files. To be done everytime there are changes like:
                                       - New external dependencies
                                       - New app
                                       - Adding or deleting src or include files
+          fcpp reload -v        ->    Same, listing every discovered source file
           
           To add external dependencies, edit "CorePackages.cmake" in the root directory,
           where you will find some examples which you can uncomment (fmt,json,boost).
@@ -377,79 +1634,307 @@ def help():
           
           """)
 
+def build_command(args, app_args):
+    if args.compare_unity:
+        return compare_unity(args.profile, args.jobs)
+    if args.compare_modules:
+        return compare_modules(args.profile, args.jobs)
+    profile = args.profile
+    if args.sanitize:
+        import sanitizers
+        profile = sanitizers.sanitizer_profile(profile, sanitizers.parse_sanitize(args.sanitize))
+    if args.trace:
+        profile = derive_profile(resolve_profile(profile), "trace", "-ftime-trace")
+    return build(args.targets, force=args.command == "fbuild", jobs=args.jobs,
+                 load_average=args.load_average, keep_going=args.keep_going, profile=profile)
+
+def bench_command(args, app_args):
+    cpus = [int(c) for c in args.cpus.split(",")] if args.cpus else None
+    return bench(args.app, app_args, args.runs, args.warmup, cpus, args.profile, args.compare, not args.no_save)
+
+def test_command(args, app_args):
+    shard = None
+    if args.shard:
+        index, _, count = args.shard.partition("/")
+        index, count = (int(index), int(count)) if index.isdecimal() and count.isdecimal() else (0, 0)
+        if not 1 <= index <= count:
+            print(f"Invalid shard {args.shard}, expected i/n with 1 <= i <= n.")
+            return False
+        shard = (index, count)
+    return test(args.profile, args.sanitize, args.jobs, shard, args.timeout, args.junit, args.tests_regex)
+
+def deps_command(args, app_args):
+    if args.action == "prefetch":
+        return deps_prefetch(args.build, args.profile)
+    if args.action == "list":
+        return deps_list()
+    if args.action == "graph":
+        return deps_graph(args.top, args.dot, args.json, args.what_rebuilds, args.profile)
+    return deps_prune(args.days)
+
+# Subcommand -> handler(args, app_args). A handler returning a bool sets the exit code.
+COMMANDS = {
+    "cmake_gen": lambda args, app_args: cmake_gen(args.compiler_cache, args.profile),
+    "fbuild": build_command,
+    "build": build_command,
+    "reload": lambda args, app_args: reload(args.verbose, args.compiler_cache, args.profile),
+    "render_vscode_debug_json": lambda args, app_args: render_debug_config_vscode(),
+    "render": lambda args, app_args: render_cmake_files(args.verbose),
+    "add_external_dependency": lambda args, app_args: add_external_dependency(),
+    "create_project": lambda args, app_args: project_wizard(),
+    "create_app": lambda args, app_args: create_app(),
+    "create_bench": lambda args, app_args: create_bench(args.name),
+    "bench-micro": lambda args, app_args: bench_micro(args.threshold, args.update_baseline, args.filter,
+                                                      args.repetitions, args.metric, args.profile),
+    "run": lambda args, app_args: run(args.app, args.profile, app_args, timeout=args.timeout,
+                                      as_json=args.json, sanitize=args.sanitize),
+    "watch": lambda args, app_args: watch(args.app, args.restart, args.profile, args.debounce / 1000, args.poll),
+    "bench": bench_command,
+    "profile": lambda args, app_args: profile_app(args.app, app_args, args.dwarf, args.frequency, args.top),
+    "size": lambda args, app_args: size_app(args.app, args.profile, args.top, args.compare,
+                                            args.max_growth, not args.no_save),
+    "pgo": lambda args, app_args: pgo(args.app, app_args, args.profile),
+    "test": test_command,
+    "clean": lambda args, app_args: clean(),
+    "tidy": lambda args, app_args: tidy(args.app, args.changed, args.jobs, args.profile),
+    "format": lambda args, app_args: format_code(args.check, args.jobs),
+    "buildstats": lambda args, app_args: build_stats(args.profile, args.top),
+    "pch": lambda args, app_args: pch_analyze(args.top, args.save),
+    "cache": lambda args, app_args: cache_stats(),
+    "deps": deps_command,
+}
+
+def startup_mode():
+    # How this fcpp was started: PyInstaller onefile/onedir, zipapp or plain script
+    if getattr(sys, "frozen", False):
+        bundle = getattr(sys, "_MEIPASS", "")
+        # onefile unpacks to a fresh _MEIxxxxxx temp dir, onedir runs from next to the executable
+        return "pyinstaller-onedir" if os.path.dirname(os.path.abspath(sys.executable)) in bundle else "pyinstaller-onefile"
+    if not os.path.isfile(__file__):
+        return "zipapp"
+    return "script"
+
+def drop_page_cache():
+    # Empties the page cache for the whole machine, so only on request (--drop-caches) and only as root
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except (OSError, AttributeError):
+        return False
+
+def startup_bench(runs=20, drop_caches=False):
+    import statistics
+    # Time "fcpp --help" in fresh processes: interpreter start, imports and argument parsing
+    command = [sys.executable] if getattr(sys, "frozen", False) else [sys.executable, sys.argv[0]]
+    command.append("--help")
+    dropped = drop_caches and drop_page_cache()
+    if drop_caches and not dropped:
+        print("Could not drop the page cache (needs root), the cold run is just the first run")
+    times = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        times.append(time.perf_counter() - start)
+    cold, warm = times[0], sorted(times[1:])
+    print(f"Startup of {' '.join(command)} ({startup_mode()}):")
+    print(f"    cold   : {cold * 1000:7.1f} ms" + (" (after dropping the page cache)" if dropped else " (first run)"))
+    print(f"    warm   : {statistics.median(warm) * 1000:7.1f} ms median, {warm[0] * 1000:.1f} ms min, "
+          f"{warm[-1] * 1000:.1f} ms max over {runs} runs")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Project management tool")
-    subparsers = parser.add_subparsers(dest="command", required=True)
+    parser.add_argument("--startup-bench", nargs="?", type=int, const=20, metavar="RUNS",
+                        help="Measure cold and warm startup time of fcpp itself")
+    parser.add_argument("--drop-caches", action="store_true",
+                        help="With --startup-bench, drop the system page cache before the cold run (root only)")
+    # Not required, so --startup-bench works on its own; checked after parsing
+    subparsers = parser.add_subparsers(dest="command")
+
+    # Shared options
+    verbose_parser = argparse.ArgumentParser(add_help=False)
+    verbose_parser.add_argument("-v", "--verbose", action="store_true", help="List every discovered source file")
+    
+    cache_parser = argparse.ArgumentParser(add_help=False)
+    cache_parser.add_argument("--compiler-cache", choices=["auto", "ccache", "sccache", "none"], default=None,
+                              help="Compiler launcher, saved as COMPILER_CACHE in .project.config.json")
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    profile_parser.add_argument("-p", "--profile", default=None,
+                                help="Build profile (default: DEFAULT_PROFILE in .project.config.json)")
+    sanitize_parser = argparse.ArgumentParser(add_help=False)
+    sanitize_parser.add_argument("--sanitize", default=None,
+                                 help="Sanitizers, e.g. address,undefined or thread (separate build tree)")
     
     # CreateProject command
     subparsers.add_parser("create_project")
     
-    subparsers.add_parser("reload")
+    subparsers.add_parser("reload", parents=[verbose_parser, cache_parser, profile_parser])
     
     subparsers.add_parser("render_vscode_debug_json")
     
     # CreateApp command
     subparsers.add_parser("create_app")
+
+    # CreateBench command
+    parser_create_bench = subparsers.add_parser("create_bench")
+    parser_create_bench.add_argument("name", nargs="?", default=None, help="Benchmark name")
+
+    # Micro-benchmarks command
+    parser_bench_micro = subparsers.add_parser("bench-micro", parents=[profile_parser])
+    parser_bench_micro.add_argument("--threshold", type=float, default=None,
+                                    help="Allowed regression in percent (default: BENCH_THRESHOLD_PCT)")
+    parser_bench_micro.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser_bench_micro.add_argument("--filter", default=None, help="Only run benchmarks matching this regex")
+    parser_bench_micro.add_argument("--repetitions", type=int, default=1, help="Repetitions (medians are compared)")
+    parser_bench_micro.add_argument("--metric", choices=["real_time", "cpu_time"], default="real_time")
     
     # AddExternalDependency command
     subparsers.add_parser("add_external_dependency")
     
     # Render command
-    subparsers.add_parser("render")
+    subparsers.add_parser("render", parents=[verbose_parser])
 
     # Build command
-    subparsers.add_parser("cmake_gen")
+    subparsers.add_parser("cmake_gen", parents=[cache_parser, profile_parser])
     
+    # Build commands
+    build_parser = argparse.ArgumentParser(add_help=False, parents=[profile_parser, sanitize_parser])
+    build_parser.add_argument("targets", nargs="*", help="Build target names (default: all)")
+    build_parser.add_argument("-j", "--jobs", type=int, default=None,
+                              help="Parallel jobs (default: based on cores and available memory)")
+    build_parser.add_argument("-l", "--load-average", type=float, default=None,
+                              help="Don't start new jobs if the load average is greater than this")
+    build_parser.add_argument("-k", "--keep-going", action="store_true",
+                              help="Keep building other targets after a failure")
+    build_parser.add_argument("--compare-unity", action="store_true",
+                              help="Report clean-build wall time with and without unity builds")
+    build_parser.add_argument("--compare-modules", action="store_true",
+                              help="Report clean-build times of the header and C++20 module layouts")
+    build_parser.add_argument("--trace", action="store_true",
+                              help="Build with -ftime-trace in build/<profile>-trace (see fcpp buildstats)")
+
     # ForceBuild command
-    parser_build = subparsers.add_parser("fbuild")
-    parser_build.add_argument("target", nargs="?", default=None, help="Build target name (default: all)")
+    subparsers.add_parser("fbuild", parents=[build_parser])
     
     # SmartBuild command
-    parser_build = subparsers.add_parser("build")
-    parser_build.add_argument("target", nargs="?", default=None, help="Build target name (default: all)")
+    subparsers.add_parser("build", parents=[build_parser])
+
+    # Build statistics command
+    parser_buildstats = subparsers.add_parser("buildstats", parents=[profile_parser])
+    parser_buildstats.add_argument("--top", type=int, default=15, help="Rows per table")
 
     # Run command
-    parser_run = subparsers.add_parser("run")
+    parser_run = subparsers.add_parser("run", parents=[profile_parser, sanitize_parser])
     parser_run.add_argument("app", help="Run app name")
+    parser_run.add_argument("--timeout", type=float, default=None, help="Kill the app after this many seconds")
+    parser_run.add_argument("--json", nargs="?", const="-", default=None, metavar="FILE",
+                            help="Write exit status and resource usage as JSON to FILE (default: stderr)")
+
+    # Watch command
+    parser_watch = subparsers.add_parser("watch", parents=[profile_parser])
+    parser_watch.add_argument("app", nargs="?", default=None, help="App to rebuild (default: all affected apps)")
+    parser_watch.add_argument("-r", "--restart", action="store_true", help="Restart the app after each successful build")
+    parser_watch.add_argument("--debounce", type=int, default=200, help="Milliseconds of quiet before rebuilding")
+    parser_watch.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify")
+
+    # Benchmark command
+    parser_bench = subparsers.add_parser("bench", parents=[profile_parser])
+    parser_bench.add_argument("app", help="App to benchmark")
+    parser_bench.add_argument("-n", "--runs", type=int, default=30, help="Measured runs")
+    parser_bench.add_argument("--warmup", type=int, default=3, help="Unmeasured warmup runs")
+    parser_bench.add_argument("--cpus", default=None, help="Pin the app to these CPU ids, e.g. 2,3")
+    parser_bench.add_argument("--compare", default=None, help="Results file or git revision to compare with")
+    parser_bench.add_argument("--no-save", action="store_true", help="Don't save the results under build/bench/")
+
+    # Profile command (perf)
+    parser_profile = subparsers.add_parser("profile")
+    parser_profile.add_argument("app", help="App to profile")
+    parser_profile.add_argument("--dwarf", action="store_true", help="Unwind with --call-graph dwarf instead of frame pointers")
+    parser_profile.add_argument("-F", "--frequency", type=int, default=999, help="Sampling frequency (Hz)")
+    parser_profile.add_argument("--top", type=int, default=25, help="Functions in the table")
+
+    # Binary size command
+    parser_size = subparsers.add_parser("size", parents=[profile_parser])
+    parser_size.add_argument("app", help="App to analyze (release profile by default)")
+    parser_size.add_argument("--top", type=int, default=15, help="Rows per table")
+    parser_size.add_argument("--compare", default=None,
+                             help="Profile, ELF file, saved report or git revision to diff with")
+    parser_size.add_argument("--max-growth", type=float, default=None, metavar="PCT",
+                             help="Fail if the loaded size grew by more than PCT percent (with --compare)")
+    parser_size.add_argument("--no-save", action="store_true", help="Don't save the report under build/size/")
+
+    # PGO command
+    parser_pgo = subparsers.add_parser("pgo", parents=[profile_parser])
+    parser_pgo.add_argument("app", help="App to optimize")
 
     # Test command
-    subparsers.add_parser("test")
+    parser_test = subparsers.add_parser("test", parents=[profile_parser, sanitize_parser])
+    parser_test.add_argument("-j", "--jobs", type=int, default=None, help="Tests run in parallel")
+    parser_test.add_argument("--shard", default=None, help="Run shard i of n (1-based), e.g. 2/4")
+    parser_test.add_argument("--timeout", type=float, default=None, help="Per-test timeout in seconds")
+    parser_test.add_argument("--junit", default=None, help="Write a JUnit XML report to this path")
+    parser_test.add_argument("-R", "--tests-regex", default=None, help="Only run tests matching this regex")
 
     # Clean command
     subparsers.add_parser("clean")
 
+    # Tidy command
+    parser_tidy = subparsers.add_parser("tidy", parents=[profile_parser])
+    parser_tidy.add_argument("app", nargs="?", default=None, help="Only check this app (or core)")
+    parser_tidy.add_argument("--changed", action="store_true", help="Only check TUs affected by files changed against git HEAD")
+    parser_tidy.add_argument("-j", "--jobs", type=int, default=None, help="Parallel clang-tidy processes")
+
     # Format command
-    subparsers.add_parser("format")
-
-    args = parser.parse_args()
-
-    if args.command == "cmake_gen":
-        cmake_gen()
-    elif args.command == "fbuild":
-        build(args.target,force=True)
-    elif args.command == "build":
-        build(args.target,force=False)
-    elif args.command == "reload":
-        reload()
-    elif args.command == "render_vscode_debug_json":
-        render_debug_config_vscode()
-    elif args.command == "render":
-        render_cmake_files()
-    elif args.command == "add_external_dependency":
-        add_external_dependency()
-    elif args.command == "create_project":
-        project_wizard()
-    elif args.command == "create_app":
-        create_app()
-    elif args.command == "run":
-        run(args.app)
-    elif args.command == "test":
-        test()
-    elif args.command == "clean":
-        clean(args.build_dir)
-    elif args.command == "format":
-        format_code()
+    parser_format = subparsers.add_parser("format")
+    parser_format.add_argument("--check", action="store_true", help="Don't modify files, exit non-zero if any need formatting")
+    parser_format.add_argument("-j", "--jobs", type=int, default=None, help="Parallel clang-format processes")
+
+    # Precompiled headers command
+    parser_pch = subparsers.add_parser("pch")
+    parser_pch.add_argument("action", choices=["analyze"], help="Precompiled headers action")
+    parser_pch.add_argument("--top", type=int, default=None, help="Number of headers to list (default: PCH TOP_N)")
+    parser_pch.add_argument("--save", action="store_true", help="Save the top headers as the PCH list and enable it")
+
+    # Dependency store command
+    parser_deps = subparsers.add_parser("deps", parents=[profile_parser])
+    parser_deps.add_argument("action", choices=["prefetch", "list", "prune", "graph"],
+                             help="Dependency store action, or graph for the project's include graph")
+    parser_deps.add_argument("--build", action="store_true",
+                             help="prefetch: also prebuild and install the dependencies for the profile")
+    parser_deps.add_argument("--days", type=int, default=None,
+                             help="prune: remove entries unused for this many days (default: 30)")
+    parser_deps.add_argument("--top", type=int, default=20, help="graph: rows per table")
+    parser_deps.add_argument("--dot", default=None, help="graph: write the include graph as Graphviz DOT")
+    parser_deps.add_argument("--json", default=None, help="graph: write the include graph as JSON")
+    parser_deps.add_argument("--what-rebuilds", default=None, metavar="FILE",
+                             help="graph: list the TUs and targets rebuilt when FILE changes")
+
+    # Compiler cache command
+    parser_cache = subparsers.add_parser("cache")
+    parser_cache.add_argument("action", choices=["stats"], help="Compiler cache action")
+
+    # Everything after "--" is forwarded to the app (run, bench, profile, pgo)
+    argv = sys.argv[1:]
+    app_args = []
+    if "--" in argv:
+        app_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+    args = parser.parse_args(argv)
+    if args.startup_bench is not None:
+        startup_bench(args.startup_bench, args.drop_caches)
+        return
+    if args.command is None:
+        parser.error("a command is required")
 
+    status = COMMANDS[args.command](args, app_args)
+    # Commands reporting success as a bool set the exit code, "run" passes on the app's
+    if isinstance(status, bool):
+        sys.exit(0 if status else 1)
+    if args.command == "run" and isinstance(status, int):
+        # Like a shell: 128 + signal number when the app was killed
+        sys.exit(128 - status if status < 0 else status & 0xFF)
 
 if __name__ == "__main__":
     main()
@@ -1,38 +1,85 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+#   pyinstaller fcpp.spec                 -> dist/fcpp      (onefile: unpacks itself to a temp dir on every run)
+#   pyinstaller fcpp.spec -- --onedir     -> dist/fcpp/fcpp (onedir: nothing to unpack, fastest frozen startup)
+#   pyinstaller fcpp.spec -- --zipapp     -> dist/fcpp.pyz  (zipapp: precompiled modules, needs python3 on PATH)
+#
+# Compare the modes with "fcpp --startup-bench" (see README.md).
+import argparse, compileall, glob, os, py_compile, shutil, zipapp
 
+parser = argparse.ArgumentParser()
+mode = parser.add_mutually_exclusive_group()
+mode.add_argument("--onedir", action="store_true", help="Build a directory instead of a self-extracting executable")
+mode.add_argument("--zipapp", action="store_true", help="Build a Python zipapp instead of a frozen executable")
+options = parser.parse_args()
 
-a = Analysis(
-    ['fcpp.py'],
-    pathex=[],
-    binaries=[],
-    datas=[],
-    hiddenimports=[],
-    hookspath=[],
-    hooksconfig={},
-    runtime_hooks=[],
-    excludes=[],
-    noarchive=False,
-    optimize=0,
-)
-pyz = PYZ(a.pure)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='fcpp',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+spec_dir = globals().get("SPECPATH", os.path.dirname(os.path.abspath(__file__)))
+dist_dir = globals().get("DISTPATH", os.path.join(spec_dir, "dist"))
+
+
+def build_zipapp():
+    # Modules are shipped with unchecked-hash .pyc next to them, so nothing is compiled at startup
+    stage = os.path.join(spec_dir, "build", "zipapp")
+    shutil.rmtree(stage, ignore_errors=True)
+    os.makedirs(stage)
+    for module in glob.glob(os.path.join(spec_dir, "*.py")):
+        shutil.copy(module, stage)
+    compileall.compile_dir(stage, quiet=1, legacy=True,
+                           invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+    os.makedirs(dist_dir, exist_ok=True)
+    target = os.path.join(dist_dir, "fcpp.pyz")
+    zipapp.create_archive(stage, target, interpreter="/usr/bin/env python3", main="fcpp:main")
+    print(f"Built {target}")
+
+
+if options.zipapp:
+    build_zipapp()
+else:
+    a = Analysis(
+        ['fcpp.py'],
+        pathex=[],
+        binaries=[],
+        datas=[],
+        hiddenimports=[],
+        hookspath=[],
+        hooksconfig={},
+        runtime_hooks=[],
+        excludes=[],
+        noarchive=False,
+        optimize=0,
+    )
+    pyz = PYZ(a.pure)
+
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [] if options.onedir else a.binaries,
+        [] if options.onedir else a.datas,
+        [],
+        exclude_binaries=options.onedir,
+        name='fcpp',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        # UPX-compressed binaries have to be decompressed at every start
+        upx=not options.onedir,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+
+    if options.onedir:
+        coll = COLLECT(
+            exe,
+            a.binaries,
+            a.datas,
+            strip=False,
+            upx=False,
+            upx_exclude=[],
+            name='fcpp',
+        )
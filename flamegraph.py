@@ -0,0 +1,107 @@
+import html, re, zlib
+
+FRAME_RE = re.compile(r"^\s*[0-9a-fA-F]+\s+(.+?)(?:\s+\((.*)\))?$")
+OFFSET_RE = re.compile(r"\+0x[0-9a-fA-F]+$")
+
+
+def fold_perf_script(lines):
+    # Folds `perf script` output into {"root;...;leaf": samples}, like stackcollapse-perf.pl
+    folded = {}
+    comm, frames = None, []
+
+    def flush():
+        if comm is not None and frames:
+            stack = ";".join([comm] + frames[::-1])
+            folded[stack] = folded.get(stack, 0) + 1
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            flush()
+            comm, frames = None, []
+        elif not line.startswith("\t"):
+            # Sample header ("comm pid time: event"); comm may be right-aligned with spaces
+            flush()
+            comm, frames = line.split()[0], []
+        else:
+            match = FRAME_RE.match(line)
+            if not match:
+                continue
+            symbol, dso = match.group(1), match.group(2) or ""
+            if symbol == "[unknown]":
+                symbol = f"[{dso.rsplit('/', 1)[-1] or 'unknown'}]"
+            frames.append(OFFSET_RE.sub("", symbol).replace(";", ":"))
+    flush()
+    return folded
+
+def function_table(folded):
+    # {function: (self samples, inclusive samples)}, recursive frames counted once per sample
+    table = {}
+    for stack, count in folded.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        for frame in set(frames):
+            self_count, inclusive = table.get(frame, (0, 0))
+            table[frame] = (self_count, inclusive + count)
+        self_count, inclusive = table[frames[-1]]
+        table[frames[-1]] = (self_count + count, inclusive)
+    return table
+
+def _build_tree(folded):
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in folded.items():
+        root["value"] += count
+        node = root
+        for frame in stack.split(";"):
+            child = node["children"].setdefault(frame, {"name": frame, "value": 0, "children": {}})
+            child["value"] += count
+            node = child
+    return root
+
+def _color(name):
+    # Stable warm colors, as in the classic flamegraph palette
+    h = zlib.crc32(name.encode())
+    return f"rgb({205 + h % 50},{(h >> 8) % 230},{(h >> 16) % 55})"
+
+def render_svg(folded, title, width=1200, frame_height=16, min_width=0.1):
+    root = _build_tree(folded)
+    total = root["value"] or 1
+    rects = []
+    max_depth = 0
+
+    def layout(node, x, depth):
+        nonlocal max_depth
+        w = node["value"] / total * (width - 20)
+        if w < min_width:
+            return
+        max_depth = max(max_depth, depth)
+        rects.append((node["name"], node["value"], x, depth, w))
+        for child in sorted(node["children"].values(), key=lambda c: c["name"]):
+            layout(child, x, depth + 1)
+            x += child["value"] / total * (width - 20)
+
+    layout(root, 10, 0)
+    height = (max_depth + 1) * frame_height + 50
+    out = ['<?xml version="1.0" standalone="no"?>',
+           f'<svg version="1.1" width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg" '
+           f'font-family="Verdana" font-size="12">',
+           f'<rect x="0" y="0" width="{width}" height="{height}" fill="#f8f8f8"/>',
+           f'<text x="{width / 2}" y="24" text-anchor="middle" font-size="17">{html.escape(title)}</text>']
+    for name, value, x, depth, w in rects:
+        y = height - (depth + 1) * frame_height - 10
+        label = html.escape(name)
+        tooltip = f"{label} ({value} samples, {100.0 * value / total:.2f}%)"
+        chars = int(w / 7)
+        if len(name) <= chars:
+            text = label
+        elif chars > 3:
+            text = html.escape(name[:chars - 2]) + ".."
+        else:
+            text = ""
+        out.append(f'<g><title>{tooltip}</title><rect x="{x:.1f}" y="{y}" width="{w:.1f}" '
+                   f'height="{frame_height - 1}" fill="{_color(name)}" rx="2"/>'
+                   + (f'<text x="{x + 3:.1f}" y="{y + frame_height - 4}">{text}</text>' if text else "")
+                   + "</g>")
+    out.append("</svg>")
+    return "\n".join(out)
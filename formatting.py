@@ -0,0 +1,64 @@
+import difflib, hashlib, json, os, subprocess
+import config as conf
+from utils import get_apps, find_source_files
+
+FORMAT_EXTENSIONS = (".cpp", ".cc", ".hpp", ".h", ".cppm")
+
+
+def format_targets():
+    files = find_source_files("core", FORMAT_EXTENSIONS)
+    for app in get_apps():
+        files.extend(find_source_files(f"apps/{app}", FORMAT_EXTENSIONS))
+    return files
+
+def digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def style_key():
+    # Cached results are only valid for the .clang-format they were produced with
+    return digest(".clang-format") or "default"
+
+def load_cache():
+    try:
+        with open(conf.FORMAT_CACHE, "r") as f:
+            cache = json.load(f)
+        if cache.get("style") == style_key():
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"style": style_key(), "files": {}}
+
+def save_cache(cache):
+    os.makedirs(os.path.dirname(conf.FORMAT_CACHE), exist_ok=True)
+    with open(conf.FORMAT_CACHE, "w") as f:
+        json.dump(cache, f)
+
+def batches(files, count):
+    return [files[i::count] for i in range(count) if files[i::count]]
+
+def format_batch(files):
+    # (files, ok): a failing batch is reported and left uncached, the other batches still count
+    try:
+        subprocess.run(["clang-format", "-i"] + files, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"clang-format failed (exit {e.returncode}) on: {' '.join(files)}")
+        return files, False
+    return files, True
+
+def check_file(path):
+    # (path, changed line count) of the diff clang-format would apply; None if clang-format failed
+    try:
+        formatted = subprocess.run(["clang-format", path], capture_output=True, text=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        print(f"clang-format failed (exit {e.returncode}) on {path}: {e.stderr.strip()}")
+        return path, None
+    with open(path, "r") as f:
+        original = f.read()
+    if formatted == original:
+        return path, 0
+    diff = difflib.unified_diff(original.splitlines(), formatted.splitlines(), lineterm="", n=0)
+    return path, sum(1 for line in diff if line[:1] in "+-" and line[:3] not in ("+++", "---"))
@@ -0,0 +1,154 @@
+import os, re
+from utils import get_apps, find_source_files
+
+INCLUDE_RE = re.compile(r'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\n]+)[>"]', re.M)
+
+
+def parse_includes(path):
+    # [(delimiter, header)] for every #include of a file, in order
+    try:
+        with open(path, "r", errors="replace") as f:
+            return INCLUDE_RE.findall(f.read())
+    except OSError:
+        return []
+
+def project_include_dirs():
+    return ["core/include"] + [f"apps/{app}/include" for app in get_apps()]
+
+def project_source_files(index=None):
+    files = find_source_files("core", index=index)
+    for app in get_apps():
+        files.extend(find_source_files(f"apps/{app}", index=index))
+    return files
+
+def resolve_include(delimiter, header, including_file, include_dirs):
+    # Path of the project file an include refers to, or None for system/third-party headers
+    candidates = list(include_dirs)
+    if delimiter == '"':
+        candidates.insert(0, os.path.dirname(including_file))
+    for directory in candidates:
+        path = os.path.normpath(os.path.join(directory, header)).replace("\\", "/")
+        if os.path.isfile(path):
+            return path
+    return None
+
+def header_kind(header):
+    # C++ standard library headers have neither an extension nor a directory
+    if "." not in header and "/" not in header:
+        return "std"
+    if header.endswith(".h") and "/" not in header:
+        return "system"
+    return "third-party"
+
+def rank_external_headers(files=None):
+    # {header: number of files including it} for headers that are not part of the project
+    files = files if files is not None else project_source_files()
+    include_dirs = project_include_dirs()
+    counts = {}
+    for path in files:
+        seen = set()
+        for delimiter, header in parse_includes(path):
+            header = header.strip()
+            if header in seen or resolve_include(delimiter, header, path, include_dirs):
+                continue
+            seen.add(header)
+            counts[header] = counts.get(header, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+def include_graph(files, include_dirs, cache):
+    # {file: [project files it includes directly]}; files whose mtime is unchanged reuse cache["files"]
+    cached = cache.setdefault("files", {})
+    graph, scanned = {}, 0
+    pending = list(files)
+    while pending:
+        path = pending.pop()
+        if path in graph:
+            continue
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        entry = cached.get(path)
+        if not entry or entry[0] != mtime:
+            edges = []
+            for delimiter, header in parse_includes(path):
+                resolved = resolve_include(delimiter, header.strip(), path, include_dirs)
+                if resolved:
+                    edges.append(resolved)
+            entry = cached[path] = [mtime, edges]
+            scanned += 1
+        graph[path] = entry[1]
+        pending.extend(entry[1])
+    for path in list(cached):
+        if path not in graph:
+            del cached[path]
+    return graph, scanned
+
+def is_translation_unit(path):
+    return path.endswith((".c", ".cc", ".cpp", ".cxx"))
+
+def closures(graph):
+    # {file: every project file it includes, transitively}
+    memo = {}
+
+    def visit(path):
+        if path in memo:
+            return memo[path]
+        memo[path] = set()  # guards include cycles
+        found = set()
+        for header in graph.get(path, []):
+            found.add(header)
+            found |= visit(header)
+        memo[path] = found
+        return found
+
+    for path in graph:
+        visit(path)
+    return memo
+
+def dependents(graph, path):
+    # Translation units that include path, directly or not (a changed TU is its own dependent)
+    reverse = {}
+    for source, headers in graph.items():
+        for header in headers:
+            reverse.setdefault(header, set()).add(source)
+    seen, pending = {path}, [path]
+    while pending:
+        for parent in reverse.get(pending.pop(), ()):
+            if parent not in seen:
+                seen.add(parent)
+                pending.append(parent)
+    return sorted(p for p in seen if is_translation_unit(p))
+
+def redundant_includes(graph, reach):
+    # [(file, header, via)] for direct includes that another direct include already brings in
+    found = []
+    for path, headers in sorted(graph.items()):
+        seen = set()
+        for header in headers:
+            if header in seen:
+                found.append((path, header, None))  # included twice
+                continue
+            seen.add(header)
+            via = next((other for other in headers if other != header and header in reach.get(other, ())), None)
+            if via:
+                found.append((path, header, via))
+    return found
+
+def owning_target(path):
+    # core, an app or a benchmark: the CMake target a file belongs to
+    parts = path.split("/")
+    if parts[0] == "apps" and len(parts) > 2:
+        return parts[1]
+    if parts[0] == "benchmarks" and len(parts) > 2:
+        return f"bench_{parts[1]}"
+    return parts[0]
+
+def object_source(output):
+    # "apps/asd/CMakeFiles/asd.dir/src/main.cpp.o" -> "apps/asd/src/main.cpp"
+    if "/CMakeFiles/" not in output and not output.startswith("CMakeFiles/"):
+        return None
+    prefix, _, rest = ("/" + output).partition("/CMakeFiles/")
+    _, _, source = rest.partition(".dir/")
+    source = os.path.splitext(source)[0]
+    return f"{prefix.strip('/')}/{source}" if prefix.strip("/") else source
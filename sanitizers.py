@@ -0,0 +1,92 @@
+import os, re, shutil, sys
+import config as conf
+from utils import derive_profile, resolve_profile, get_build_dir
+
+HEADER_RE = re.compile(r"(?:ERROR|WARNING): (\w+Sanitizer): (.*?)(?: on address| \(pid=|$)")
+UBSAN_RE = re.compile(r"^(\S+:\d+:\d+): runtime error: (.*)$")
+# "#0 0x4c5d in main /src/main.cpp:10" (ASan/UBSan) or "#0 worker() /src/main.cpp:3 (app+0x1b)" (TSan)
+FRAME_RE = re.compile(r"^\s*#(\d+) (?:0x[0-9a-f]+ in )?(.+?)(?: \([^()]*\+0x[0-9a-f]+\))?$")
+
+
+def parse_sanitize(value):
+    # "address,undefined" -> sorted list of sanitizer names, exits on unknown/incompatible ones
+    names = sorted({n.strip() for n in value.split(",") if n.strip()})
+    unknown = [n for n in names if n not in conf.SANITIZERS]
+    if unknown or not names:
+        print(f"Unknown sanitizer {', '.join(unknown)}. Available: {', '.join(conf.SANITIZERS)}")
+        sys.exit(1)
+    for pair in conf.INCOMPATIBLE_SANITIZERS:
+        if pair <= set(names):
+            print(f"Sanitizers {' and '.join(sorted(pair))} can't be combined.")
+            sys.exit(1)
+    return names
+
+def sanitizer_profile(profile, names):
+    flags = " ".join(conf.SANITIZERS[n]["FLAGS"] for n in names)
+    # -fsanitize flags are merged by clang, duplicated -fno-omit-frame-pointer is harmless
+    return derive_profile(resolve_profile(profile), "-".join(conf.SANITIZERS[n]["SHORT"] for n in names),
+                          flags, flags)
+
+def log_dir(profile):
+    return f"{get_build_dir(profile[0])}/sanitizer"
+
+def sanitizer_env(names, profile):
+    # Reports go to log files (one per process) so they can be summarized afterwards
+    directory = log_dir(profile)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    log_path = os.path.abspath(f"{directory}/report")
+    env = {}
+    for name in names:
+        sanitizer = conf.SANITIZERS[name]
+        options = ":".join(o for o in (sanitizer["OPTIONS"], f"log_path={log_path}",
+                                       os.environ.get(sanitizer["ENV"], "")) if o)
+        env[sanitizer["ENV"]] = options
+    return env
+
+def parse_reports(text, top_frames=3):
+    # [(kind, message, [top frames])] for each report in a sanitizer log
+    issues = []
+    current = None
+    for line in text.splitlines():
+        header = HEADER_RE.search(line)
+        ubsan = UBSAN_RE.match(line)
+        if header or ubsan:
+            if current:
+                issues.append(current)
+            if header:
+                current = (header.group(1), header.group(2).strip(), [])
+            else:
+                current = ("UndefinedBehaviorSanitizer", f"{ubsan.group(2)} at {ubsan.group(1)}", [])
+            continue
+        frame = FRAME_RE.match(line)
+        if current and frame and len(current[2]) < top_frames:
+            # Only the first stack of a report (e.g. the access, not the allocation)
+            if int(frame.group(1)) == len(current[2]):
+                current[2].append(frame.group(2).strip())
+    if current:
+        issues.append(current)
+    return issues
+
+def summarize(profile, top_frames=3):
+    # Prints unique issues found in the logs of the last run, returns their count
+    directory = log_dir(profile)
+    unique = {}
+    try:
+        files = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        files = []
+    for name in files:
+        with open(os.path.join(directory, name), "r", errors="replace") as f:
+            for kind, message, frames in parse_reports(f.read(), top_frames):
+                key = (kind, re.sub(r"0x[0-9a-f]+", "0x", message), tuple(frames))
+                unique[key] = unique.get(key, 0) + 1
+    if not unique:
+        print("Sanitizers: no issues reported.")
+        return 0
+    print(f"Sanitizers: {len(unique)} unique issue(s), full reports in {directory}/")
+    for (kind, message, frames), count in sorted(unique.items(), key=lambda i: -i[1]):
+        print(f"  [{kind}] {message}" + (f" (x{count})" if count > 1 else ""))
+        for frame in frames:
+            print(f"      {frame}")
+    return len(unique)
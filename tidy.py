@@ -0,0 +1,96 @@
+import hashlib, json, os, subprocess
+import config as conf
+from includes import parse_includes, resolve_include, project_include_dirs
+
+CACHE_VERSION = 1
+
+
+def load_compile_commands(build_dir):
+    # {absolute source path: compile command entry} for the project's own TUs
+    with open(f"{build_dir}/compile_commands.json", "r") as f:
+        entries = json.load(f)
+    root = os.path.abspath(".")
+    commands = {}
+    for entry in entries:
+        path = os.path.normpath(os.path.join(entry["directory"], entry["file"]))
+        rel = os.path.relpath(path, root).replace("\\", "/")
+        if rel.startswith(("core/", "apps/")) and "/_deps/" not in rel:
+            commands[rel] = entry
+    return commands
+
+def project_includes(path, include_dirs, memo):
+    # Project files included by path, transitively (system/third-party headers are skipped)
+    if path in memo:
+        return memo[path]
+    memo[path] = set()  # guards include cycles
+    found = set()
+    for delimiter, header in parse_includes(path):
+        resolved = resolve_include(delimiter, header.strip(), path, include_dirs)
+        if resolved and resolved not in found:
+            found.add(resolved)
+            found |= project_includes(resolved, include_dirs, memo)
+    memo[path] = found
+    return found
+
+def file_digest(path, digests):
+    if path not in digests:
+        try:
+            with open(path, "rb") as f:
+                digests[path] = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            digests[path] = ""
+    return digests[path]
+
+def tu_key(path, entry, checks, headers, digests):
+    # Hash of the TU, the project headers it includes, its flags and the checks
+    h = hashlib.sha256()
+    h.update(json.dumps([CACHE_VERSION, checks, entry.get("command") or entry.get("arguments")]).encode())
+    for p in [path] + sorted(headers) + [".clang-tidy"]:
+        h.update(p.encode())
+        h.update(file_digest(p, digests).encode())
+    return h.hexdigest()
+
+def load_cache():
+    try:
+        with open(conf.TIDY_CACHE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache):
+    os.makedirs(os.path.dirname(conf.TIDY_CACHE), exist_ok=True)
+    with open(conf.TIDY_CACHE, "w") as f:
+        json.dump(cache, f)
+
+def run_clang_tidy(path, build_dir, checks):
+    # (path, findings count, output)
+    completed = subprocess.run(["clang-tidy", "-p", build_dir, f"--checks={checks}", "--quiet", path],
+                               capture_output=True, text=True, errors="replace")
+    output = completed.stdout.strip()
+    findings = sum(1 for line in output.splitlines() if ": warning: " in line or ": error: " in line)
+    if completed.returncode != 0 and not findings:
+        findings = 1
+        output = (output + "\n" + completed.stderr.strip()).strip()
+    return path, findings, output
+
+def changed_files(base="HEAD"):
+    # Files changed against base, plus untracked ones
+    diff = subprocess.run(["git", "diff", "--name-only", "--diff-filter=d", base],
+                          capture_output=True, text=True, check=True).stdout.split()
+    untracked = subprocess.run(["git", "ls-files", "--others", "--exclude-standard"],
+                               capture_output=True, text=True, check=True).stdout.split()
+    return set(diff) | set(untracked)
+
+def select_units(commands, app=None, changed=None):
+    # {TU: project headers it includes}, restricted to an app and/or to TUs affected by changed files
+    include_dirs = project_include_dirs()
+    memo = {}
+    units = {}
+    for path in commands:
+        if app and not path.startswith(("core/" if app == "core" else f"apps/{app}/")):
+            continue
+        headers = project_includes(path, include_dirs, memo)
+        if changed is not None and path not in changed and not (headers & changed):
+            continue
+        units[path] = headers
+    return units
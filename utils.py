@@ -1,4 +1,5 @@
-import json, re, os
+import json, re, os, shutil, subprocess, sys, threading, time
+import config as conf
 
 def get_config():
     try:
@@ -29,12 +30,361 @@ def is_valid_folder_name(name):
 
     return bool(re.fullmatch(pattern, name))
 
-def find_cpp_files(dir_name):
-    cpp_files = []
-    for root, _, files in os.walk(dir_name):
-        for file in files:
-            if file.endswith(".cpp"):
-                full_path = os.path.join(root, file).replace("\\","/")
-                cpp_files.append("/".join(full_path.split("/")[len(dir_name.split("/")):]))
-    print(f"SRC files found under {dir_name} : \n    {"\n    ".join(cpp_files)}")
-    return cpp_files
\ No newline at end of file
+def load_discovery_index():
+    try:
+        with open(conf.DISCOVERY_INDEX,"r") as di:
+            index = json.loads(di.read())
+        if index.get("version") == conf.DISCOVERY_INDEX_VERSION:
+            return index
+    except Exception:
+        pass
+    return {"version": conf.DISCOVERY_INDEX_VERSION, "dirs": {}}
+
+def save_discovery_index(index):
+    if not index.pop("dirty", False):
+        return
+    os.makedirs(conf.BUILD_DIR, exist_ok=True)
+    with open(conf.DISCOVERY_INDEX,"w") as di:
+        di.write(json.dumps(index))
+
+def _scan_dir(path, index):
+    # Re-list a directory only when its mtime changed since the last scan.
+    # Adding/removing entries bumps the mtime of the direct parent only, so
+    # subdirectories still have to be visited (but not listed) every time.
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    cached = index["dirs"].get(path)
+    if cached is None or cached["mtime"] != mtime:
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in conf.DISCOVERY_PRUNED_DIRS:
+                        subdirs.append(entry.name)
+                elif entry.name.endswith(conf.SOURCE_EXTENSIONS):
+                    files.append(entry.name)
+        cached = {"mtime": mtime, "files": sorted(files), "subdirs": sorted(subdirs)}
+        index["dirs"][path] = cached
+        index["dirty"] = True
+    found = [f"{path}/{f}" for f in cached["files"]]
+    for sub in cached["subdirs"]:
+        found.extend(_scan_dir(f"{path}/{sub}", index))
+    return found
+
+def find_source_files(dir_name, extensions=conf.SOURCE_EXTENSIONS, index=None):
+    # Paths (including dir_name) of the C/C++ files under dir_name, from the discovery index
+    own_index = index is None
+    if own_index:
+        index = load_discovery_index()
+    dir_name = dir_name.replace("\\","/").rstrip("/")
+    found = [f for f in _scan_dir(dir_name, index) if f.endswith(extensions)]
+    if own_index:
+        save_discovery_index(index)
+    return found
+
+def find_cpp_files(dir_name, verbose=False, index=None):
+    dir_name = dir_name.replace("\\","/").rstrip("/")
+    prefix_len = len(dir_name) + 1
+    cpp_files = [f[prefix_len:] for f in find_source_files(dir_name, ".cpp", index)]
+    if verbose:
+        listing = "\n    ".join(cpp_files)
+        print(f"SRC files found under {dir_name} : \n    {listing}")
+    else:
+        print(f"SRC files found under {dir_name} : {len(cpp_files)}")
+    return cpp_files
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo","r") as mi:
+            for line in mi:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def default_job_count():
+    # One job per core, unless available memory can't hold that many heavy TUs
+    jobs = os.cpu_count() or 1
+    memory = available_memory_mb()
+    per_job = get_config().get("BUILD_JOB_MEMORY_MB", conf.DEFAULT_JOB_MEMORY_MB)
+    if memory and per_job:
+        jobs = min(jobs, max(1, memory // per_job))
+    return jobs
+
+def get_target_setting(config, target, key, default):
+    # Project-wide setting, overridden per target (core or app) under TARGET_SETTINGS
+    setting = dict(default)
+    setting.update(config.get(key) or {})
+    setting.update(((config.get("TARGET_SETTINGS") or {}).get(target) or {}).get(key) or {})
+    return setting
+
+def get_core_components(config):
+    # {component: [components it depends on]} when core is split ("CORE_COMPONENTS"), else None.
+    # Every core/src/<component> directory is a component, declared or not, and every
+    # component depends on "common" (the files directly under core/src) when there is one.
+    declared = config.get("CORE_COMPONENTS")
+    if not isinstance(declared, dict):
+        return None
+    components = {name: list(deps or []) for name, deps in declared.items()}
+    if os.path.isdir("core/src"):
+        for entry in sorted(os.listdir("core/src")):
+            if os.path.isdir(f"core/src/{entry}"):
+                if entry not in conf.DISCOVERY_PRUNED_DIRS:
+                    components.setdefault(entry, [])
+            elif entry.endswith(conf.SOURCE_EXTENSIONS):
+                components.setdefault(conf.CORE_COMMON_COMPONENT, [])
+    if conf.CORE_COMMON_COMPONENT in components:
+        for name, deps in components.items():
+            if name != conf.CORE_COMMON_COMPONENT and conf.CORE_COMMON_COMPONENT not in deps:
+                deps.append(conf.CORE_COMMON_COMPONENT)
+    return components
+
+def component_closure(components, names):
+    # names and every component they depend on, in a stable order
+    found = []
+    pending = list(names)
+    while pending:
+        name = pending.pop(0)
+        if name in found or name not in components:
+            continue
+        found.append(name)
+        pending.extend(components[name])
+    return sorted(found)
+
+def get_app_components(config, components, app):
+    # Components an app (or benchmark) links: TARGET_SETTINGS.<app>.CORE_COMPONENTS and their
+    # dependencies ([] for none), or all of them if the app doesn't say
+    used = ((config.get("TARGET_SETTINGS") or {}).get(app) or {}).get("CORE_COMPONENTS")
+    if used is None:
+        return sorted(components)
+    unknown = [name for name in used if name not in components]
+    if unknown:
+        print(f"Unknown core components for {app}: {', '.join(unknown)}. "
+              f"Available components: {', '.join(sorted(components))}")
+        sys.exit(1)
+    return component_closure(components, used)
+
+def get_profiles():
+    # Built-in profiles, extended/overridden by "PROFILES" in .project.config.json
+    profiles = {name: dict(settings) for name, settings in conf.DEFAULT_PROFILES.items()}
+    for name, settings in (get_config().get("PROFILES") or {}).items():
+        profiles.setdefault(name, {}).update(settings)
+    return profiles
+
+def get_default_profile():
+    return get_config().get("DEFAULT_PROFILE", conf.DEFAULT_PROFILE)
+
+def resolve_profile(name=None):
+    # Accepts a profile name, or an already resolved (name, settings) pair
+    if isinstance(name, tuple):
+        return name
+    name = name or get_default_profile()
+    profiles = get_profiles()
+    if name not in profiles:
+        print(f"Profile {name} doesn't exist. Available profiles: {', '.join(profiles)}")
+        sys.exit(1)
+    return name, profiles[name]
+
+def derive_profile(base, suffix, cxx_flags="", linker_flags="", cmake_args=None):
+    # Variant of a resolved profile with extra flags, built in build/<profile>-<suffix>
+    name, settings = base
+    settings = dict(settings)
+    settings["CXX_FLAGS"] = " ".join(f for f in (settings.get("CXX_FLAGS", ""), cxx_flags) if f)
+    settings["LINKER_FLAGS"] = " ".join(f for f in (settings.get("LINKER_FLAGS", ""), linker_flags) if f)
+    settings["CMAKE_ARGS"] = settings.get("CMAKE_ARGS", []) + (cmake_args or [])
+    return f"{name}-{suffix}", settings
+
+def get_build_dir(profile):
+    return f"{conf.BUILD_DIR}/{profile}"
+
+def get_exe_path(app, profile):
+    exe_path = f"{get_build_dir(profile)}/apps/{app}/{app}"
+    if conf.IS_WINDOWS:
+        exe_path+=".exe"
+    return exe_path
+
+def find_compiler_cache(choice):
+    # choice is one of "auto", "ccache", "sccache" or "none"
+    if not choice or choice == "none":
+        return None
+    candidates = ["ccache", "sccache"] if choice == "auto" else [choice]
+    for candidate in candidates:
+        if shutil.which(candidate):
+            return candidate
+    if choice != "auto":
+        print(f"Compiler cache {choice} not found on PATH, building without it.")
+    return None
+
+def compiler_cache_stats(launcher):
+    # Returns (hits, misses, size_in_bytes or None), or None if unavailable
+    try:
+        if launcher == "ccache":
+            out = subprocess.run(["ccache", "--print-stats"], capture_output=True, text=True, check=True).stdout
+            stats = dict(line.split("\t", 1) for line in out.splitlines() if "\t" in line)
+            hits = int(stats.get("direct_cache_hit", 0)) + int(stats.get("preprocessed_cache_hit", 0))
+            misses = int(stats.get("cache_miss", 0))
+            size = int(stats["cache_size_kibibyte"]) * 1024 if "cache_size_kibibyte" in stats else None
+            return hits, misses, size
+        if launcher == "sccache":
+            out = subprocess.run(["sccache", "--show-stats", "--stats-format", "json"],
+                                 capture_output=True, text=True, check=True).stdout
+            data = json.loads(out)
+            stats = data.get("stats", {})
+            hits = sum(stats.get("cache_hits", {}).get("counts", {}).values())
+            misses = sum(stats.get("cache_misses", {}).get("counts", {}).values())
+            return hits, misses, data.get("cache_size")
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        pass
+    return None
+
+def find_linker(choice):
+    # Returns the -fuse-ld= value for choice ("auto", "mold", "lld" or "default"), or None
+    if not choice or choice == "default":
+        return None
+    candidates = ["mold", "lld"] if choice == "auto" else [choice]
+    for candidate in candidates:
+        if shutil.which("ld.lld" if candidate == "lld" else candidate):
+            return candidate
+    if choice != "auto":
+        print(f"Linker {choice} not found on PATH, using the default linker.")
+    return None
+
+def build_env():
+    # Let ccache rewrite absolute paths under the project root, so clean
+    # builds in another checkout (e.g. CI workspaces) still hit the cache.
+    env = dict(os.environ)
+    env.setdefault("CCACHE_BASEDIR", os.getcwd())
+    return env
+
+# Runs argv[2:] and writes its wait status, wall time and rusage to fd argv[1]. On exec, Linux
+# carries the parent's peak RSS over into the child's, so the app is forked from this small
+# interpreter rather than from fcpp; signal is only imported after the fork for that reason.
+# Peak RSS still has a floor of about 5 MiB, the helper's own size at the fork.
+MEASURE_HELPER = r"""import os, sys, time
+start = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    try:
+        os.execvp(sys.argv[2], sys.argv[2:])
+    except OSError as e:
+        os.write(2, f"{sys.argv[2]}: {e.strerror}\n".encode())
+    os._exit(127)
+import signal
+signal.signal(signal.SIGTERM, lambda *_: os.kill(pid, signal.SIGKILL))
+_, status, u = os.wait4(pid, 0)
+wall = time.perf_counter() - start
+os.write(int(sys.argv[1]), " ".join(map(str, (status, wall, u.ru_utime, u.ru_stime, u.ru_maxrss,
+                                               u.ru_minflt, u.ru_majflt, u.ru_nvcsw, u.ru_nivcsw))).encode())
+"""
+
+def run_measured(command, env=None, timeout=None, cpus=None, stdout=None):
+    # Runs command and returns its exit code, wall time and wait4 resource usage
+    # (ru_maxrss is in KiB on Linux). cpus pins the process to those CPU ids.
+    preexec = None
+    if cpus and hasattr(os, "sched_setaffinity"):
+        preexec = lambda: os.sched_setaffinity(0, cpus)
+    # A frozen fcpp has no interpreter to run the helper with: measure directly
+    helper = hasattr(os, "fork") and hasattr(os, "wait4") and not getattr(sys, "frozen", False)
+    read_fd = write_fd = None
+    if helper:
+        read_fd, write_fd = os.pipe()
+        command = [sys.executable, "-S", "-E", "-c", MEASURE_HELPER, str(write_fd)] + list(command)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=stdout, preexec_fn=preexec,
+                               pass_fds=(write_fd,) if helper else ())
+    timer = None
+    timed_out = []
+    if timeout:
+        def kill():
+            timed_out.append(True)
+            if helper:
+                # The helper kills the app with SIGKILL and still reports its usage
+                process.terminate()
+            else:
+                process.kill()
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+    usage = None
+    try:
+        if helper:
+            os.close(write_fd)
+            with os.fdopen(read_fd, "rb") as report:
+                fields = report.read().split()
+            process.wait()
+            if fields:
+                status, wall, *usage = fields
+                process.returncode = os.waitstatus_to_exitcode(int(status))
+                usage = [float(wall)] + [float(v) for v in usage]
+        elif hasattr(os, "wait4"):
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            usage = [time.perf_counter() - start, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss,
+                     rusage.ru_minflt, rusage.ru_majflt, rusage.ru_nvcsw, rusage.ru_nivcsw]
+        else:
+            process.wait()
+    finally:
+        if timer:
+            timer.cancel()
+    result = {
+        "exit_code": process.returncode,
+        "wall": usage[0] if usage else time.perf_counter() - start,
+        "timed_out": bool(timed_out),
+    }
+    if usage:
+        wall, utime, stime, maxrss, minflt, majflt, nvcsw, nivcsw = usage
+        result.update({
+            "user": utime,
+            "sys": stime,
+            "maxrss_kb": int(maxrss) // 1024 if sys.platform == "darwin" else int(maxrss),
+            "minflt": int(minflt),
+            "majflt": int(majflt),
+            "nvcsw": int(nvcsw),
+            "nivcsw": int(nivcsw),
+        })
+    return result
+
+def git_revision():
+    # Short HEAD hash with a "-dirty" suffix for uncommitted changes, or None outside git
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def revision_matches(path, ref):
+    # Results saved as <timestamp>-<revision>.json: ref is that short revision (with "-dirty"
+    # for uncommitted runs) or a longer hash of the same commit
+    saved = os.path.splitext(os.path.basename(path))[0].split("-", 1)[-1]
+    return saved == ref or (not saved.endswith("-dirty") and len(ref) > len(saved) and ref.startswith(saved))
+
+def tool_version(command):
+    # (major, minor, patch) from "<command> --version", or None if it can't be run
+    try:
+        output = subprocess.run([command, "--version"], capture_output=True, text=True, check=False).stdout
+    except OSError:
+        return None
+    match = re.search(r"(\d+)\.(\d+)(?:\.(\d+))?", output)
+    return tuple(int(n or 0) for n in match.groups()) if match else None
+
+def parse_version(text):
+    return tuple(int(n) for n in text.split("."))
+
+def write_if_changed(path, content):
+    # Returns True if the file was (re)written, False if it was already up to date
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    with open(path, "w") as f:
+        f.write(content)
+    return True
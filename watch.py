@@ -0,0 +1,143 @@
+import ctypes, ctypes.util, os, select, struct, time
+import config as conf
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_watched(path):
+    # Generated CMakeLists.txt are not watched, or every render would trigger another cycle
+    return path.endswith(conf.SOURCE_EXTENSIONS)
+
+def walk_dirs(roots):
+    for root in roots:
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in conf.DISCOVERY_PRUNED_DIRS]
+            yield dirpath.replace("\\", "/")
+
+def _load_libc():
+    if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") and hasattr(libc, "inotify_add_watch") else None
+
+def _inotify_batches(roots, debounce):
+    libc = _load_libc()
+    fd = libc.inotify_init1(IN_NONBLOCK)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    watches = {}
+
+    def add_watch(path):
+        wd = libc.inotify_add_watch(fd, path.encode(), WATCH_MASK)
+        if wd >= 0:
+            watches[wd] = path
+
+    for path in walk_dirs(roots):
+        add_watch(path)
+    poller = select.poll()
+    poller.register(fd, select.POLLIN)
+    try:
+        while True:
+            poller.poll()
+            first_event = time.perf_counter()
+            changes = {}
+            # Keep draining until the burst of saves has been quiet for `debounce` seconds
+            while True:
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b""
+                offset = 0
+                while offset + EVENT_HEADER.size <= len(data):
+                    wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0").decode(errors="replace")
+                    offset += EVENT_HEADER.size + length
+                    if mask & IN_IGNORED:
+                        watches.pop(wd, None)
+                        continue
+                    directory = watches.get(wd)
+                    if directory is None or not name:
+                        continue
+                    path = f"{directory}/{name}"
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO) and name not in conf.DISCOVERY_PRUNED_DIRS:
+                            for sub in walk_dirs([path]):
+                                add_watch(sub)
+                            changes[path] = "added"
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            changes[path] = "removed"
+                    elif is_watched(path):
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            changes[path] = "modified" if changes.get(path) == "removed" else "added"
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            changes[path] = "removed"
+                        else:
+                            changes.setdefault(path, "modified")
+                if not poller.poll(int(debounce * 1000)):
+                    break
+            if changes:
+                yield first_event, changes
+    finally:
+        os.close(fd)
+
+def _snapshot(roots):
+    files = {}
+    for directory in walk_dirs(roots):
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_file() and is_watched(entry.name):
+                        files[f"{directory}/{entry.name}"] = entry.stat().st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return files
+
+def _poll_batches(roots, debounce, interval):
+    previous = _snapshot(roots)
+    while True:
+        time.sleep(interval)
+        current = _snapshot(roots)
+        if current == previous:
+            continue
+        first_event = time.perf_counter()
+        # Wait for the tree to settle before reporting the batch
+        while True:
+            time.sleep(debounce)
+            settled = _snapshot(roots)
+            if settled == current:
+                break
+            current = settled
+        changes = {}
+        for path in current.keys() - previous.keys():
+            changes[path] = "added"
+        for path in previous.keys() - current.keys():
+            changes[path] = "removed"
+        for path in current.keys() & previous.keys():
+            if current[path] != previous[path]:
+                changes[path] = "modified"
+        previous = current
+        yield first_event, changes
+
+def watch_changes(roots, debounce=0.2, poll=False, interval=0.5):
+    # Yields (time of the first event, {path: "added" | "removed" | "modified"}) per burst of changes
+    if not poll and _load_libc() is not None:
+        try:
+            yield from _inotify_batches(roots, debounce)
+            return
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling.")
+    yield from _poll_batches(roots, debounce, interval)